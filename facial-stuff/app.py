@@ -1,5 +1,7 @@
 import modal
 import os
+import time
+import asyncio
 import logging
 import cv2
 import face_recognition
@@ -8,19 +10,34 @@ import tempfile
 import subprocess
 import uuid
 import requests
+import httpx
+import orjson
 import pickle
 import base64
 import re
-from typing import List, Optional, Dict, Tuple, BinaryIO, Any
+import multiprocessing
+import hashlib
+import io
+from typing import List, Optional, Dict, Tuple, BinaryIO, Any, Union
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 
+try:
+    # ANN index for profile matching; linear scan is used if unavailable
+    import faiss
+except ImportError:
+    faiss = None
+
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,6 +45,13 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------
 # Utilities
 
+# Precompiled patterns for the base64 helpers below; these run on every
+# image upload so we skip the re-cache lookup per call
+_NON_B64_RE = re.compile(r"[^A-Za-z0-9+/=]")
+_B64_CHAR_RE = re.compile(r"[A-Za-z0-9+/=]")
+_WHITESPACE_RE = re.compile(r"\s")
+_DATA_URL_PREFIX = "data:image/"
+
 
 def decode_image_base64_str(image_str: str) -> bytes:
     """Decode a base64 image string into raw bytes.
@@ -42,7 +66,7 @@ def decode_image_base64_str(image_str: str) -> bytes:
     logger.info(f"Starting base64 decode for string of length {original_length}")
 
     # Remove data URL prefix if present
-    if image_str.startswith("data:image/"):
+    if image_str.startswith(_DATA_URL_PREFIX):
         try:
             image_str = image_str.split(",", 1)[1]
             logger.info(f"Removed data URL prefix, new length: {len(image_str)}")
@@ -51,7 +75,7 @@ def decode_image_base64_str(image_str: str) -> bytes:
 
     # Remove whitespace/newlines and any other non-base64 characters
     # Valid base64 characters are A-Z, a-z, 0-9, +, /, and = for padding
-    clean_str = re.sub(r'[^A-Za-z0-9+/=]', '', image_str)
+    clean_str = _NON_B64_RE.sub('', image_str)
     logger.info(f"After cleaning invalid characters, length: {len(clean_str)} (removed {len(image_str) - len(clean_str)} chars)")
 
     # Remove any existing padding first
@@ -92,13 +116,13 @@ def decode_image_base64_str(image_str: str) -> bytes:
 def try_repair_base64(b64_str: str) -> str:
     """Try to repair a potentially corrupted base64 string."""
     # Remove any whitespace
-    b64_str = re.sub(r'\s', '', b64_str)
+    b64_str = _WHITESPACE_RE.sub('', b64_str)
     
     # Remove common corruption characters
     b64_str = b64_str.replace('.', '')  # Periods are common corruption
     
     # Keep only valid base64 characters
-    b64_str = re.sub(r'[^A-Za-z0-9+/=]', '', b64_str)
+    b64_str = _NON_B64_RE.sub('', b64_str)
     
     # Remove existing padding
     b64_str = b64_str.rstrip('=')
@@ -115,14 +139,14 @@ def debug_base64_string(b64_str: str, profile_id: str = "unknown") -> Dict[str,
     diagnostics = {
         "profile_id": profile_id,
         "original_length": len(b64_str),
-        "has_data_url_prefix": b64_str.startswith("data:image/"),
+        "has_data_url_prefix": b64_str.startswith(_DATA_URL_PREFIX),
         "starts_with": b64_str[:50] if len(b64_str) > 50 else b64_str,
         "ends_with": b64_str[-50:] if len(b64_str) > 50 else b64_str,
     }
     
     # Remove data URL prefix if present
     work_str = b64_str
-    if work_str.startswith("data:image/"):
+    if work_str.startswith(_DATA_URL_PREFIX):
         try:
             work_str = work_str.split(",", 1)[1]
             diagnostics["after_prefix_removal"] = len(work_str)
@@ -131,7 +155,7 @@ def debug_base64_string(b64_str: str, profile_id: str = "unknown") -> Dict[str,
             return diagnostics
     
     # Count valid vs invalid characters
-    valid_chars = len(re.findall(r'[A-Za-z0-9+/=]', work_str))
+    valid_chars = len(_B64_CHAR_RE.findall(work_str))
     invalid_chars = len(work_str) - valid_chars
     diagnostics["valid_chars"] = valid_chars
     diagnostics["invalid_chars"] = invalid_chars
@@ -241,6 +265,15 @@ class MatchResult:
     confidence: float
     is_existing_profile: bool
 
+# Stacked profile gallery for one analyze run; carried per call instead of
+# stored on the shared FaceProcessor so concurrent analyze requests can't
+# swap each other's profiles mid-run
+@dataclass
+class ProfileGallery:
+    profile_ids: List[str]
+    matrix: Optional[np.ndarray]
+    ann_index: Optional[object] = None  # faiss HNSW index over matrix, if faiss is available
+
 @dataclass
 class InteractionResult:
     profile_id: str
@@ -257,7 +290,27 @@ class InteractionResult:
 # Services classes
 class SupabaseClient:
     def __init__(self, supabase_url: str, supabase_key: str):
-        self.client: Client = create_client(supabase_url, supabase_key)
+        # Inject a pooled HTTP/2 client: the default postgrest limits
+        # (20 keep-alive connections) can be exhausted under concurrent
+        # inputs, and a short connect timeout makes stale sockets fail fast
+        try:
+            options = ClientOptions(
+                httpx_client=httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_keepalive_connections=60, max_connections=120
+                    ),
+                    timeout=httpx.Timeout(10.0, connect=2.0),
+                )
+            )
+            self.client: Client = create_client(supabase_url, supabase_key, options)
+        except TypeError:
+            # Older supabase-py without httpx_client support
+            self.client: Client = create_client(supabase_url, supabase_key)
+        # Cached deserialized gallery from get_all_profiles_with_photos,
+        # keyed by the server-side max updated_at so a cheap conditional
+        # query can skip the per-profile base64+pickle decode
+        self._gallery_cache: Optional[Tuple[str, List[Dict]]] = None
 
     def upsert_profile_face_data(
         self,
@@ -306,6 +359,37 @@ class SupabaseClient:
             logger.error(f"Full traceback: {traceback.format_exc()}")
             raise
 
+    def batch_upsert_profile_face_data(self, rows: List[Dict]) -> None:
+        """Upsert face encodings for many profiles in one PostgREST request
+
+        Each row carries id, face_encoding (base64 pickle), optional
+        reference_image, and updated_at.
+        """
+        if not rows:
+            return
+
+        try:
+            logger.info(f"Batch updating {len(rows)} profiles with face encodings...")
+
+            # Use direct HTTP call to avoid Supabase client issues
+            import requests
+            url = f"{os.environ['SUPABASE_URL']}/rest/v1/profiles_images"
+            headers = {
+                "apikey": os.environ["SUPABASE_SERVICE_KEY"],
+                "Authorization": f"Bearer {os.environ['SUPABASE_SERVICE_KEY']}",
+                "Content-Type": "application/json",
+                "Prefer": "resolution=merge-duplicates"
+            }
+
+            response = requests.post(url, json=rows, headers=headers)
+            response.raise_for_status()
+
+            logger.info(f"Successfully batch updated {len(rows)} profiles")
+
+        except Exception as e:
+            logger.error(f"Error batch updating profile face data: {str(e)}")
+            raise
+
     def get_all_profiles_with_photos(self) -> List[Dict]:
         """Get all profiles that have profile photos"""
         try:
@@ -313,6 +397,23 @@ class SupabaseClient:
 
             # Use direct HTTP call since Supabase client queries are failing
             import requests
+
+            # Cheap conditional check: if nothing changed server-side since the
+            # last call, reuse the already-deserialized gallery
+            max_updated_url = f"{os.environ['SUPABASE_URL']}/rest/v1/profiles_images?select=updated_at&order=updated_at.desc&limit=1&apikey={os.environ['SUPABASE_SERVICE_KEY']}"
+            max_updated_response = requests.get(max_updated_url)
+            max_updated_response.raise_for_status()
+            max_updated_data = max_updated_response.json()
+            max_updated_at = max_updated_data[0].get("updated_at") if max_updated_data else None
+
+            if (
+                self._gallery_cache is not None
+                and max_updated_at is not None
+                and self._gallery_cache[0] == max_updated_at
+            ):
+                logger.info(f"Gallery unchanged (updated_at={max_updated_at}), returning {len(self._gallery_cache[1])} cached profiles")
+                return self._gallery_cache[1]
+
             url = f"{os.environ['SUPABASE_URL']}/rest/v1/profiles_images?select=id%2Cname%2Cemail%2Cface_encoding%2Cprofile_photo%2Creference_image%2Cvideo_ids&apikey={os.environ['SUPABASE_SERVICE_KEY']}"
 
             response = requests.get(url)
@@ -346,6 +447,9 @@ class SupabaseClient:
 
                 profiles.append(profile)
 
+            if max_updated_at is not None:
+                self._gallery_cache = (max_updated_at, profiles)
+
             logger.info(f"Retrieved {len(profiles)} profiles with photos via direct HTTP API")
             return profiles
 
@@ -417,6 +521,55 @@ class SupabaseClient:
             logger.error(f"Error adding video to profile: {str(e)}")
             raise
 
+    def batch_add_video_to_profiles(self, video_id: str, profile_ids: List[str]) -> None:
+        """Add a video ID to many profiles' video_ids arrays in two round trips"""
+        if not profile_ids:
+            return
+
+        try:
+            # One select for all current arrays, one multi-row upsert back
+            result = (
+                self.client.table("profiles_images")
+                .select("id, video_ids")
+                .in_("id", profile_ids)
+                .execute()
+            )
+
+            now = datetime.now().isoformat()
+            rows = []
+            for profile in result.data or []:
+                current_video_ids = profile.get("video_ids") or []
+                if video_id not in current_video_ids:
+                    rows.append({
+                        "id": profile["id"],
+                        "video_ids": current_video_ids + [video_id],
+                        "updated_at": now,
+                    })
+
+            if rows:
+                self.client.table("profiles_images").upsert(rows).execute()
+
+            logger.info(f"Added video {video_id} to {len(rows)} profiles")
+
+        except Exception as e:
+            logger.error(f"Error batch adding video to profiles: {str(e)}")
+            raise
+
+    def batch_upsert_interactions(self, pairs: List[Dict]) -> None:
+        """Upsert many interactions via one batch_upsert_interactions RPC
+
+        Each pair is {"uid1": ..., "uid2": ..., "increment_by": ...}.
+        """
+        if not pairs:
+            return
+
+        try:
+            self.client.rpc("batch_upsert_interactions", {"pairs": pairs}).execute()
+            logger.info(f"Batch upserted {len(pairs)} interactions")
+        except Exception as e:
+            logger.error(f"Error batch upserting interactions: {str(e)}")
+            raise
+
     def upsert_interaction(self, user_id_1: str, user_id_2: str, increment: int = 1) -> Dict:
         """Upsert interaction between two users using the database function"""
         try:
@@ -441,18 +594,30 @@ class VideoChunker:
         self.chunk_duration = chunk_duration_seconds
         self.temp_dir = "/tmp"
 
-    def download_video_from_url(self, video_url: str) -> bytes:
-        """Download video from URL and return bytes"""
+    def download_video_from_url(self, video_url: str) -> str:
+        """Stream video from URL into a tempfile and return its path
+
+        Streams with iter_content instead of buffering the whole response in
+        memory, so peak RSS stays flat regardless of video size.
+        """
         try:
-            response = requests.get(video_url, stream=True)
-            response.raise_for_status()
-            return response.content
+            with requests.get(video_url, stream=True) as response:
+                response.raise_for_status()
+                with tempfile.NamedTemporaryFile(
+                    suffix=".mp4", dir=self.temp_dir, delete=False
+                ) as video_file:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        video_file.write(chunk)
+                    return video_file.name
         except Exception as e:
             logger.error(f"Failed to download video from {video_url}: {str(e)}")
             raise
 
-    def get_video_duration(self, video_path: str) -> float:
-        """Get the duration of a video file in seconds"""
+    def get_video_duration(self, video: Union[bytes, str]) -> float:
+        """Get the duration of a video in seconds
+
+        Accepts either raw bytes (piped to ffprobe over stdin) or a file path.
+        """
         try:
             cmd = [
                 "ffprobe",
@@ -462,9 +627,15 @@ class VideoChunker:
                 "format=duration",
                 "-of",
                 "default=noprint_wrappers=1:nokey=1",
-                video_path,
             ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            if isinstance(video, bytes):
+                cmd += ["-i", "pipe:0"]
+                result = subprocess.run(
+                    cmd, input=video, capture_output=True, check=True
+                )
+            else:
+                cmd += [video]
+                result = subprocess.run(cmd, capture_output=True, check=True)
             duration = float(result.stdout.strip())
             logger.info(f"Video duration: {duration} seconds")
             return duration
@@ -477,9 +648,14 @@ class VideoChunker:
         Download video from URL and split into chunks
         Returns list of (chunk_id, chunk_data, chunk_index, start_time, end_time)
         """
-        # Download video
-        video_data = self.download_video_from_url(video_url)
-        return self.split_video(video_data, video_id)
+        # Download straight to disk and split from the path so the full video
+        # never sits in Python memory
+        video_path = self.download_video_from_url(video_url)
+        try:
+            return self.split_video_path(video_path, video_id)
+        finally:
+            if os.path.exists(video_path):
+                os.remove(video_path)
 
     def split_video(
         self, video_data: bytes, video_id: str
@@ -488,8 +664,6 @@ class VideoChunker:
         Split video into chunks of specified duration
         Returns list of (chunk_id, chunk_data, chunk_index, start_time, end_time)
         """
-        chunks = []
-
         with tempfile.NamedTemporaryFile(
             suffix=".mp4", dir=self.temp_dir, delete=False
         ) as input_file:
@@ -497,99 +671,100 @@ class VideoChunker:
             input_file.flush()
             input_path = input_file.name
 
-            try:
-                duration = self.get_video_duration(input_path)
-                num_chunks = int(duration / self.chunk_duration) + (
-                    1 if duration % self.chunk_duration > 0 else 0
-                )
+        try:
+            return self.split_video_path(input_path, video_id)
+        finally:
+            if os.path.exists(input_path):
+                os.remove(input_path)
 
-                logger.info(
-                    f"Splitting video into {num_chunks} chunks of {self.chunk_duration} seconds"
-                )
+    def split_video_path(
+        self, input_path: str, video_id: str
+    ) -> List[Tuple[str, bytes, int, float, float]]:
+        """
+        Split an on-disk video into chunks of specified duration
+        Returns list of (chunk_id, chunk_data, chunk_index, start_time, end_time)
+        """
+        chunks = []
 
-                for i in range(num_chunks):
-                    chunk_id = str(uuid.uuid4())
-                    start_time = i * self.chunk_duration
-                    end_time = min((i + 1) * self.chunk_duration, duration)
-                    actual_duration = end_time - start_time
+        duration = self.get_video_duration(input_path)
+        num_chunks = int(duration / self.chunk_duration) + (
+            1 if duration % self.chunk_duration > 0 else 0
+        )
 
-                    output_path = os.path.join(self.temp_dir, f"{chunk_id}.mp4")
+        logger.info(
+            f"Splitting video into {num_chunks} chunks of {self.chunk_duration} seconds"
+        )
 
-                    try:
-                        cmd = [
-                            "ffmpeg",
-                            "-i",
-                            input_path,
-                            "-ss",
-                            str(start_time),
-                            "-t",
-                            str(actual_duration),
-                            "-c:v",
-                            "libx264",
-                            "-c:a",
-                            "aac",
-                            "-preset",
-                            "fast",
-                            "-movflags",
-                            "+faststart",
-                            "-y",
-                            output_path,
-                        ]
-
-                        subprocess.run(cmd, capture_output=True, check=True)
-
-                        with open(output_path, "rb") as chunk_file:
-                            chunk_data = chunk_file.read()
-
-                        chunks.append((chunk_id, chunk_data, i, start_time, end_time))
-                        logger.info(f"Created chunk {i + 1}/{num_chunks}: {chunk_id}")
-
-                    except subprocess.CalledProcessError as e:
-                        logger.error(f"Failed to create chunk {i}: {e.stderr.decode()}")
-                        raise
-                    finally:
-                        if os.path.exists(output_path):
-                            os.remove(output_path)
+        for i in range(num_chunks):
+            chunk_id = str(uuid.uuid4())
+            start_time = i * self.chunk_duration
+            end_time = min((i + 1) * self.chunk_duration, duration)
+            actual_duration = end_time - start_time
 
+            output_path = os.path.join(self.temp_dir, f"{chunk_id}.mp4")
+
+            try:
+                cmd = [
+                    "ffmpeg",
+                    "-i",
+                    input_path,
+                    "-ss",
+                    str(start_time),
+                    "-t",
+                    str(actual_duration),
+                    "-c:v",
+                    "libx264",
+                    "-c:a",
+                    "aac",
+                    "-preset",
+                    "fast",
+                    "-movflags",
+                    "+faststart",
+                    "-y",
+                    output_path,
+                ]
+
+                subprocess.run(cmd, capture_output=True, check=True)
+
+                with open(output_path, "rb") as chunk_file:
+                    chunk_data = chunk_file.read()
+
+                chunks.append((chunk_id, chunk_data, i, start_time, end_time))
+                logger.info(f"Created chunk {i + 1}/{num_chunks}: {chunk_id}")
+
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Failed to create chunk {i}: {e.stderr.decode()}")
+                raise
             finally:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
+                if os.path.exists(output_path):
+                    os.remove(output_path)
 
         logger.info(f"Successfully split video into {len(chunks)} chunks")
         return chunks
 
     def validate_video(self, video_data: bytes) -> bool:
         """Validate that the uploaded file is a valid video"""
-        with tempfile.NamedTemporaryFile(
-            suffix=".mp4", dir=self.temp_dir, delete=False
-        ) as temp_file:
-            temp_file.write(video_data)
-            temp_file.flush()
-            temp_path = temp_file.name
-
-            try:
-                cmd = [
-                    "ffprobe",
-                    "-v",
-                    "error",
-                    "-select_streams",
-                    "v:0",
-                    "-show_entries",
-                    "stream=codec_type",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    temp_path,
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                is_valid = result.stdout.strip() == "video"
-                logger.info(f"Video validation: {'valid' if is_valid else 'invalid'}")
-                return is_valid
-            except Exception as e:
-                logger.error(f"Failed to validate video: {str(e)}")
-                return False
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+        try:
+            cmd = [
+                "ffprobe",
+                "-v",
+                "error",
+                "-select_streams",
+                "v:0",
+                "-show_entries",
+                "stream=codec_type",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                "-i",
+                "pipe:0",
+            ]
+            result = subprocess.run(cmd, input=video_data, capture_output=True)
+            is_valid = result.stdout.strip() == b"video"
+            logger.info(f"Video validation: {'valid' if is_valid else 'invalid'}")
+            return is_valid
+        except Exception as e:
+            logger.error(f"Failed to validate video: {str(e)}")
+            return False
 
 class FaceProcessor:
     def __init__(
@@ -601,6 +776,7 @@ class FaceProcessor:
         face_grouping_threshold: float = 0.4,  # Stricter threshold for grouping faces within chunk
         min_face_size: int = 30,  # Minimum face size in pixels
         num_jitters: int = 1,  # Number of times to resample face when generating encoding
+        duplicate_hash_distance: int = 4,  # Max dHash Hamming distance to treat frames as duplicates
     ):
         self.face_match_threshold = face_match_threshold
         self.new_contact_threshold = new_contact_threshold
@@ -609,7 +785,8 @@ class FaceProcessor:
         self.face_grouping_threshold = face_grouping_threshold
         self.min_face_size = min_face_size
         self.num_jitters = num_jitters
-        
+        self.duplicate_hash_distance = duplicate_hash_distance
+
         # Log threshold information
         logger.info(f"🎯 Face processing configuration:")
         logger.info(f"   Match threshold: {self.face_match_threshold:.3f} (max distance: {1.0 - self.face_match_threshold:.3f})")
@@ -620,7 +797,12 @@ class FaceProcessor:
         logger.info(f"   Num jitters: {self.num_jitters}")
 
     def extract_frames_from_video_chunk(self, video_chunk_data: bytes) -> List[np.ndarray]:
-        """Extract all frames from a video chunk"""
+        """Extract all frames from a video chunk
+
+        Frames stay in OpenCV-native BGR; conversion to RGB happens only at
+        the face_recognition encoding calls that need it, so cropping and
+        JPEG-encoding faces skips a full-frame colour conversion.
+        """
         frames = []
 
         with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_file:
@@ -637,9 +819,7 @@ class FaceProcessor:
                     if not ret:
                         break
 
-                    # Convert BGR to RGB for face_recognition
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frames.append(rgb_frame)
+                    frames.append(frame)
                     frame_number += 1
 
                 cap.release()
@@ -650,23 +830,34 @@ class FaceProcessor:
                 if os.path.exists(temp_path):
                     os.remove(temp_path)
 
-    def detect_faces_in_frame(self, frame: np.ndarray, frame_number: int, original_frame: np.ndarray = None) -> List[FaceDetection]:
-        """Detect all faces in a single frame with optimization"""
+    def locate_faces_in_frame(
+        self, frame: np.ndarray, frame_number: int
+    ) -> List[Tuple[Tuple[int, int, int, int], float]]:
+        """Detect face bounding boxes in a single frame without computing encodings
+
+        Returns list of ((top, right, bottom, left), confidence) in original
+        frame coordinates. Encoding is deferred so near-duplicate faces across
+        frames can be deduplicated before the expensive descriptor computation.
+        """
         try:
             if frame is None or frame.size == 0:
                 logger.warning(f"Empty frame {frame_number}, skipping")
                 return []
+            # HOG detection only needs luma, so convert to grayscale before the
+            # resize: 3x less data through cv2.resize and the detector
+            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
             # Scale down frame for detection to improve speed
             if self.detection_scale != 1.0:
                 height, width = frame.shape[:2]
                 new_height, new_width = int(height * self.detection_scale), int(width * self.detection_scale)
-                detection_frame = cv2.resize(frame, (new_width, new_height))
+                detection_frame = cv2.resize(gray_frame, (new_width, new_height))
                 scale_factor = 1.0 / self.detection_scale
             else:
-                detection_frame = frame
+                detection_frame = gray_frame
                 scale_factor = 1.0
 
-            # Find face locations and encodings on scaled frame
+            # Find face locations on scaled frame
             # Use more accurate detection with better parameters
             face_locations = face_recognition.face_locations(
                 detection_frame,
@@ -674,33 +865,16 @@ class FaceProcessor:
                 number_of_times_to_upsample=1  # Better for smaller faces
             )
 
-            # If we scaled down, we need to get encodings from original resolution
+            # If we scaled down, scale face locations back to original frame
+            # size in one vectorized multiply instead of per-coordinate Python
             if self.detection_scale != 1.0 and face_locations:
-                # Scale face locations back to original frame size
-                scaled_locations = []
-                for (top, right, bottom, left) in face_locations:
-                    scaled_locations.append((
-                        int(top * scale_factor),
-                        int(right * scale_factor),
-                        int(bottom * scale_factor),
-                        int(left * scale_factor)
-                    ))
-                # Get encodings from original frame at scaled locations
-                face_encodings = face_recognition.face_encodings(
-                    frame,
-                    scaled_locations,
-                    num_jitters=self.num_jitters
-                )
-                face_locations = scaled_locations
-            else:
-                face_encodings = face_recognition.face_encodings(
-                    detection_frame,
-                    face_locations,
-                    num_jitters=self.num_jitters
-                )
+                scaled = np.multiply(
+                    face_locations, scale_factor, dtype=np.float32
+                ).astype(np.int32)
+                face_locations = [tuple(row) for row in scaled.tolist()]
 
-            detections = []
-            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
+            located = []
+            for (top, right, bottom, left) in face_locations:
                 # Calculate face dimensions
                 face_width = right - left
                 face_height = bottom - top
@@ -725,25 +899,88 @@ class FaceProcessor:
                 confidence = (size_confidence * 0.7) + (aspect_confidence * 0.3)
                 confidence = max(0.1, min(1.0, confidence))  # Clamp between 0.1 and 1.0
 
-                detection = FaceDetection(
-                    face_encoding=face_encoding,
-                    bbox=(top, right, bottom, left),
-                    confidence=confidence,
-                    frame_number=frame_number
-                )
-                detections.append(detection)
+                located.append(((top, right, bottom, left), confidence))
 
-            return detections
+            return located
 
         except Exception as e:
             logger.error(f"Error detecting faces in frame {frame_number}: {str(e)}")
             return []
 
-    def process_video_chunk_faces(self, video_chunk_data: bytes) -> List[FaceDetection]:
-        """Process all faces in a video chunk across selected frames for speed"""
-        all_detections = []
+    def detect_faces_in_frame(self, frame: np.ndarray, frame_number: int, original_frame: np.ndarray = None) -> List[FaceDetection]:
+        """Detect all faces in a single frame and compute their encodings"""
+        located = self.locate_faces_in_frame(frame, frame_number)
+        if not located:
+            return []
+
+        # Encodings come from the full-res frame; face_recognition is the only
+        # consumer that needs RGB, so convert just for this call
+        bboxes = [bbox for bbox, _ in located]
+        face_encodings = face_recognition.face_encodings(
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+            bboxes,
+            num_jitters=self.num_jitters
+        )
+
+        return [
+            FaceDetection(
+                face_encoding=face_encoding,
+                bbox=bbox,
+                confidence=confidence,
+                frame_number=frame_number,
+            )
+            for (bbox, confidence), face_encoding in zip(located, face_encodings)
+        ]
+
+    @staticmethod
+    def _frame_dhash(frame: np.ndarray) -> np.ndarray:
+        """64-bit difference hash of a frame for near-duplicate detection
 
-        frames = self.extract_frames_from_video_chunk(video_chunk_data)
+        Downsamples the luma channel to 9x8 and compares horizontally adjacent
+        pixels. Frames whose hashes differ in only a few bits are visually
+        near-identical, so the previous frame's detections can be reused.
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        return small[:, 1:] > small[:, :-1]
+
+    @staticmethod
+    def _bbox_iou(bbox1: Tuple[int, int, int, int], bbox2: Tuple[int, int, int, int]) -> float:
+        """Intersection-over-union of two (top, right, bottom, left) boxes"""
+        top1, right1, bottom1, left1 = bbox1
+        top2, right2, bottom2, left2 = bbox2
+
+        inter_top = max(top1, top2)
+        inter_bottom = min(bottom1, bottom2)
+        inter_left = max(left1, left2)
+        inter_right = min(right1, right2)
+
+        inter_area = max(0, inter_bottom - inter_top) * max(0, inter_right - inter_left)
+        if inter_area == 0:
+            return 0.0
+
+        area1 = (bottom1 - top1) * (right1 - left1)
+        area2 = (bottom2 - top2) * (right2 - left2)
+        union_area = area1 + area2 - inter_area
+
+        return inter_area / union_area if union_area > 0 else 0.0
+
+    def process_video_chunk_faces(
+        self, video_chunk_data: bytes, frames: Optional[List[np.ndarray]] = None
+    ) -> List[FaceDetection]:
+        """Process all faces in a video chunk across selected frames for speed
+
+        Runs cheap HOG localization on every selected frame, then tracks faces
+        across consecutive frames by bbox IoU and computes the expensive face
+        encoding only once per track (on the frame with the largest bbox).
+        Adjacent frames mostly contain the same faces in nearly the same spot,
+        so this cuts encoding calls by roughly the track length.
+
+        Pass frames to reuse an already-decoded frame list instead of
+        re-decoding the chunk.
+        """
+        if frames is None:
+            frames = self.extract_frames_from_video_chunk(video_chunk_data)
 
         if not frames:
             logger.warning("No frames extracted from video chunk")
@@ -753,51 +990,147 @@ class FaceProcessor:
         selected_frames = frames[::self.frame_skip]
         logger.info(f"Processing {len(selected_frames)}/{len(frames)} frames (skip={self.frame_skip})")
 
-        # Track detection quality for adaptive processing
-        detection_count = 0
-        low_quality_frames = 0
-
-        for i, frame in enumerate(selected_frames):
+        # Stage 1: localize faces in every selected frame (no encodings yet)
+        # Stage 2: greedy IoU matching against tracks active in the previous
+        # frame; unmatched detections start new tracks
+        tracks = []  # each track: list of (selected_idx, actual_frame_number, bbox, confidence)
+        active_tracks = []
+        total_localized = 0
+        duplicate_frames_skipped = 0
+        prev_hash = None
+        prev_located: List[Tuple[Tuple[int, int, int, int], float]] = []
+
+        for selected_idx, frame in enumerate(selected_frames):
             # Calculate the actual frame number in the original sequence
-            actual_frame_number = i * self.frame_skip
-            detections = self.detect_faces_in_frame(frame, actual_frame_number)
-
-            # Track detection quality
-            if detections:
-                detection_count += len(detections)
-                avg_confidence = sum(d.confidence for d in detections) / len(detections)
-                if avg_confidence < 0.5:
-                    low_quality_frames += 1
-
-            all_detections.extend(detections)
+            actual_frame_number = selected_idx * self.frame_skip
+
+            # Skip HOG detection entirely on near-duplicate consecutive frames
+            # (low-motion video): a cheap dHash tells us the frame is visually
+            # unchanged, so the previous frame's boxes still apply
+            frame_hash = self._frame_dhash(frame)
+            if (
+                prev_hash is not None
+                and np.count_nonzero(frame_hash != prev_hash) < self.duplicate_hash_distance
+            ):
+                located = prev_located
+                duplicate_frames_skipped += 1
+            else:
+                located = self.locate_faces_in_frame(frame, actual_frame_number)
+            prev_hash = frame_hash
+            prev_located = located
+            total_localized += len(located)
+
+            unmatched = list(located)
+            next_active = []
+            for track in active_tracks:
+                prev_bbox = track[-1][2]
+                best_candidate = None
+                best_iou = 0.5  # Minimum overlap to count as the same face
+                for candidate in unmatched:
+                    iou = self._bbox_iou(prev_bbox, candidate[0])
+                    if iou > best_iou:
+                        best_candidate = candidate
+                        best_iou = iou
+                if best_candidate is not None:
+                    track.append((selected_idx, actual_frame_number, best_candidate[0], best_candidate[1]))
+                    unmatched.remove(best_candidate)
+                    next_active.append(track)
+
+            for bbox, confidence in unmatched:
+                track = [(selected_idx, actual_frame_number, bbox, confidence)]
+                tracks.append(track)
+                next_active.append(track)
+
+            active_tracks = next_active
+
+        # Stage 3: encode one representative per track, at the frame where the
+        # face is largest (best quality for the descriptor)
+        all_detections = []
+        for track in tracks:
+            selected_idx, actual_frame_number, bbox, confidence = max(
+                track, key=lambda entry: (entry[2][2] - entry[2][0]) * (entry[2][1] - entry[2][3])
+            )
+            # Convert only the representative frame to RGB for dlib; all other
+            # frames never leave BGR
+            encodings = face_recognition.face_encodings(
+                cv2.cvtColor(selected_frames[selected_idx], cv2.COLOR_BGR2RGB),
+                [bbox],
+                num_jitters=self.num_jitters
+            )
+            if encodings:
+                all_detections.append(
+                    FaceDetection(
+                        face_encoding=encodings[0],
+                        bbox=bbox,
+                        confidence=confidence,
+                        frame_number=actual_frame_number,
+                    )
+                )
 
         # Log detection statistics
         logger.info(f"Face detection statistics:")
-        logger.info(f"  Total detections: {len(all_detections)}")
+        logger.info(f"  Raw localizations: {total_localized}")
+        logger.info(f"  Tracks (encodings computed): {len(tracks)}")
         logger.info(f"  Frames processed: {len(selected_frames)}/{len(frames)}")
-        logger.info(f"  Avg detections per frame: {detection_count/len(selected_frames):.2f}" if selected_frames else 0)
-        logger.info(f"  Low quality frames: {low_quality_frames}/{len(selected_frames)}")
+        logger.info(f"  Near-duplicate frames skipped: {duplicate_frames_skipped}")
 
         return all_detections
 
+    def build_profile_gallery(
+        self, profile_encodings: Dict[str, np.ndarray]
+    ) -> ProfileGallery:
+        """Stack the profile gallery into one matrix for vectorized matching"""
+        profile_ids = list(profile_encodings.keys())
+        if profile_encodings:
+            matrix = np.stack(
+                list(profile_encodings.values())
+            ).astype(np.float32)
+        else:
+            matrix = None
+
+        # Build an HNSW index so top-1 matching stays log-time as the profile
+        # DB grows; the brute-force scan remains the fallback. Vectors are
+        # stored int8 scalar-quantized inside the index, quartering the memory
+        # traffic per query at negligible recall cost for 128-dim encodings
+        ann_index = None
+        if matrix is not None and faiss is not None:
+            index = faiss.IndexHNSWSQ(
+                matrix.shape[1], faiss.ScalarQuantizer.QT_8bit, 32
+            )
+            index.train(matrix)
+            index.add(matrix)
+            ann_index = index
+
+        logger.info(
+            f"Prepared gallery matrix for {len(profile_ids)} profiles "
+            f"(ann_index={'yes' if ann_index is not None else 'no'})"
+        )
+        return ProfileGallery(
+            profile_ids=profile_ids, matrix=matrix, ann_index=ann_index
+        )
+
     def match_face_to_profiles(
         self,
+        gallery: ProfileGallery,
         face_encoding: np.ndarray,
-        profile_encodings: Dict[str, np.ndarray]
     ) -> Optional[MatchResult]:
-        """Match a face encoding to existing profiles"""
-        if not profile_encodings:
+        """Match a face encoding to the profiles in a gallery"""
+        if gallery.matrix is None:
             return None
 
-        profile_ids = list(profile_encodings.keys())
-        known_encodings = list(profile_encodings.values())
-
-        # Calculate distances to all known faces
-        distances = face_recognition.face_distance(known_encodings, face_encoding)
+        profile_ids = gallery.profile_ids
+        query = np.asarray(face_encoding, dtype=np.float32)
 
-        # Find the best match
-        min_distance_idx = np.argmin(distances)
-        min_distance = distances[min_distance_idx]
+        if gallery.ann_index is not None:
+            # HNSW top-1 search; faiss returns squared L2 distances
+            squared, indices = gallery.ann_index.search(query.reshape(1, -1), 1)
+            min_distance_idx = int(indices[0, 0])
+            min_distance = float(np.sqrt(max(float(squared[0, 0]), 0.0)))
+        else:
+            # Calculate distances to all known faces in one vectorized pass
+            distances = np.linalg.norm(gallery.matrix - query, axis=1)
+            min_distance_idx = np.argmin(distances)
+            min_distance = distances[min_distance_idx]
 
         # Convert distance to confidence (lower distance = higher confidence)
         confidence = 1.0 - min_distance
@@ -813,32 +1146,60 @@ class FaceProcessor:
 
     def match_face_to_profiles_with_detailed_scores(
         self,
+        gallery: ProfileGallery,
         face_encoding: np.ndarray,
-        profile_encodings: Dict[str, np.ndarray],
         chunk_index: int,
         face_index: int
     ) -> Optional[MatchResult]:
         """Match a face encoding to existing profiles with detailed confidence logging"""
-        if not profile_encodings:
+        if gallery.matrix is None:
             logger.info(f"Chunk {chunk_index}, Face {face_index}: No profiles to match against")
             return None
 
-        profile_ids = list(profile_encodings.keys())
-        known_encodings = list(profile_encodings.values())
+        profile_ids = gallery.profile_ids
+        query = np.asarray(face_encoding, dtype=np.float32)
+
+        # The per-profile breakdown needs every distance, so DEBUG logging
+        # forces the full scan; otherwise only the top-1 match matters and
+        # the HNSW index answers that without touching the whole gallery
+        if logger.isEnabledFor(logging.DEBUG) or gallery.ann_index is None:
+            # Calculate distances to all known faces in one vectorized pass
+            distances = np.linalg.norm(gallery.matrix - query, axis=1)
+            if logger.isEnabledFor(logging.DEBUG):
+                self._log_match_scores(gallery.profile_ids, distances, chunk_index, face_index)
+
+            # Find the best match
+            min_distance_idx = np.argmin(distances)
+            min_distance = distances[min_distance_idx]
+        else:
+            # HNSW top-1 search; faiss returns squared L2 distances
+            squared, indices = gallery.ann_index.search(query.reshape(1, -1), 1)
+            min_distance_idx = int(indices[0, 0])
+            min_distance = float(np.sqrt(max(float(squared[0, 0]), 0.0)))
 
-        # Calculate distances to all known faces
-        distances = face_recognition.face_distance(known_encodings, face_encoding)
+        best_confidence = 1.0 - min_distance
+
+        if best_confidence >= self.face_match_threshold:
+            return MatchResult(
+                profile_id=profile_ids[min_distance_idx],
+                confidence=best_confidence,
+                is_existing_profile=True
+            )
+
+        return None
+
+    def _log_match_scores(self, profile_ids: List[str], distances: np.ndarray, chunk_index: int, face_index: int) -> None:
+        """Log the full per-profile confidence breakdown for one face"""
+        logger.debug(f"\n{'='*60}")
+        logger.debug(f"CHUNK {chunk_index}, FACE {face_index} - CONFIDENCE SCORES:")
+        logger.debug(f"{'='*60}")
 
-        logger.info(f"\n{'='*60}")
-        logger.info(f"CHUNK {chunk_index}, FACE {face_index} - CONFIDENCE SCORES:")
-        logger.info(f"{'='*60}")
-        
         # Calculate and log confidence scores for ALL profiles
         all_scores = []
-        for i, (profile_id, distance) in enumerate(zip(profile_ids, distances)):
+        for profile_id, distance in zip(profile_ids, distances):
             confidence = 1.0 - distance
             all_scores.append((profile_id, confidence, distance))
-            
+
             # Add interpretation based on standard thresholds
             if distance <= 0.4:
                 interpretation = "🟢 Excellent match"
@@ -848,125 +1209,121 @@ class FaceProcessor:
                 interpretation = "🟠 Possible match (borderline)"
             else:
                 interpretation = "🔴 Poor match"
-                
-            logger.info(f"Profile {profile_id}: Confidence = {confidence:.4f} (Distance = {distance:.4f}) - {interpretation}")
-        
+
+            logger.debug(f"Profile {profile_id}: Confidence = {confidence:.4f} (Distance = {distance:.4f}) - {interpretation}")
+
         # Sort by confidence (highest first)
         all_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        logger.info(f"\nTOP 5 MATCHES (sorted by confidence):")
+
+        logger.debug(f"\nTOP 5 MATCHES (sorted by confidence):")
         for i, (profile_id, confidence, distance) in enumerate(all_scores[:5]):
             status = "✓ MATCH" if confidence >= self.face_match_threshold else "✗ below threshold"
             standard_match = "✓ Standard" if distance <= 0.6 else "✗ Above 0.6"
-            logger.info(f"  {i+1}. Profile {profile_id}: {confidence:.4f} (dist:{distance:.4f}) [{status}] [{standard_match}]")
-        
-        logger.info(f"\n📊 THRESHOLD INFO:")
-        logger.info(f"   Current threshold: {self.face_match_threshold:.3f} (max distance: {1.0-self.face_match_threshold:.3f})")
-        logger.info(f"   Standard recommendation: 0.4 (max distance: 0.6)")
-        logger.info(f"   Interpretation: Lower distance = higher similarity")
-        logger.info(f"{'='*60}\n")
-
-        # Find the best match
-        min_distance_idx = np.argmin(distances)
-        min_distance = distances[min_distance_idx]
-        best_confidence = 1.0 - min_distance
+            logger.debug(f"  {i+1}. Profile {profile_id}: {confidence:.4f} (dist:{distance:.4f}) [{status}] [{standard_match}]")
 
-        if best_confidence >= self.face_match_threshold:
-            return MatchResult(
-                profile_id=profile_ids[min_distance_idx],
-                confidence=best_confidence,
-                is_existing_profile=True
-            )
-
-        return None
+        logger.debug(f"\n📊 THRESHOLD INFO:")
+        logger.debug(f"   Current threshold: {self.face_match_threshold:.3f} (max distance: {1.0-self.face_match_threshold:.3f})")
+        logger.debug(f"   Standard recommendation: 0.4 (max distance: 0.6)")
+        logger.debug(f"   Interpretation: Lower distance = higher similarity")
+        logger.debug(f"{'='*60}\n")
 
     def create_face_encoding_from_image(self, image_data: bytes) -> np.ndarray:
         """Create face encoding from an uploaded image"""
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp_file:
-            temp_file.write(image_data)
-            temp_file.flush()
-            temp_path = temp_file.name
-
-            try:
-                # Load and process the image
-                image = face_recognition.load_image_file(temp_path)
-
-                # Find face locations first to ensure we're getting good quality faces
-                face_locations = face_recognition.face_locations(
-                    image,
-                    model="hog",
-                    number_of_times_to_upsample=1
-                )
-
-                if not face_locations:
-                    raise ValueError("No face found in the uploaded image")
-
-                # Generate face encodings with better parameters
-                encodings = face_recognition.face_encodings(
-                    image,
-                    face_locations,
-                    num_jitters=2  # More jitters for profile photos = better accuracy
-                )
-
-                if not encodings:
-                    raise ValueError("Could not generate face encoding from detected face")
-
-                if len(encodings) > 1:
-                    # If multiple faces, choose the largest one (likely the main subject)
-                    largest_face_idx = 0
-                    largest_area = 0
-
-                    for i, (top, right, bottom, left) in enumerate(face_locations):
-                        area = (right - left) * (bottom - top)
-                        if area > largest_area:
-                            largest_area = area
-                            largest_face_idx = i
-
-                    logger.warning(f"Multiple faces found in image, using largest face (face {largest_face_idx + 1}/{len(encodings)})")
-                    return encodings[largest_face_idx]
-
-                return encodings[0]
+        # Decode in memory; no tempfile round trip per photo
+        image = face_recognition.load_image_file(io.BytesIO(image_data))
+
+        # Find face locations first to ensure we're getting good quality faces
+        face_locations = face_recognition.face_locations(
+            image,
+            model="hog",
+            number_of_times_to_upsample=1
+        )
+
+        if not face_locations:
+            raise ValueError("No face found in the uploaded image")
+
+        # Generate face encodings with better parameters
+        encodings = face_recognition.face_encodings(
+            image,
+            face_locations,
+            num_jitters=2  # More jitters for profile photos = better accuracy
+        )
+
+        if not encodings:
+            raise ValueError("Could not generate face encoding from detected face")
+
+        if len(encodings) > 1:
+            # If multiple faces, choose the largest one (likely the main subject)
+            largest_face_idx = 0
+            largest_area = 0
+
+            for i, (top, right, bottom, left) in enumerate(face_locations):
+                area = (right - left) * (bottom - top)
+                if area > largest_area:
+                    largest_area = area
+                    largest_face_idx = i
+
+            logger.warning(f"Multiple faces found in image, using largest face (face {largest_face_idx + 1}/{len(encodings)})")
+            return encodings[largest_face_idx]
+
+        return encodings[0]
+
+    @staticmethod
+    def stack_encodings(face_detections: List[FaceDetection]) -> np.ndarray:
+        """Stack detection encodings into one (N, 128) float32 matrix
+
+        Computed once per chunk and shared by grouping and clustering-quality
+        analysis so each helper doesn't rebuild it.
+        """
+        return np.vstack([d.face_encoding for d in face_detections]).astype(np.float32)
 
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+    def group_faces_in_chunk(
+        self,
+        face_detections: List[FaceDetection],
+        encodings: Optional[np.ndarray] = None,
+    ) -> List[List[FaceDetection]]:
+        """Group similar faces within the same chunk to avoid duplicate counting
 
-    def group_faces_in_chunk(self, face_detections: List[FaceDetection]) -> List[List[FaceDetection]]:
-        """Group similar faces within the same chunk to avoid duplicate counting"""
+        encodings, if given, is the stack_encodings matrix in face_detections
+        order.
+        """
         if not face_detections:
             return []
 
-        # Sort detections by confidence (highest first) to prioritize better detections
-        sorted_detections = sorted(face_detections, key=lambda x: x.confidence, reverse=True)
+        if encodings is None:
+            encodings = self.stack_encodings(face_detections)
+
+        # Sort detections by confidence (highest first) to prioritize better
+        # detections; argsort over a confidence array avoids a Python
+        # key-function call per comparison
+        confidences = np.fromiter(
+            (d.confidence for d in face_detections), dtype=np.float64, count=len(face_detections)
+        )
+        order = np.argsort(-confidences)
+        sorted_detections = [face_detections[i] for i in order]
+        sorted_encodings = encodings[order]
+
+        # Compute the full pairwise distance matrix in one vectorized pass
+        # instead of one face_distance call per pair
+        distance_matrix = np.linalg.norm(
+            sorted_encodings[:, None, :] - sorted_encodings[None, :, :], axis=-1
+        )
 
         groups = []
-        used = set()
+        used = np.zeros(len(sorted_detections), dtype=bool)
 
-        for i, detection in enumerate(sorted_detections):
-            if id(detection) in used:
+        for i in range(len(sorted_detections)):
+            if used[i]:
                 continue
 
-            current_group = [detection]
-            used.add(id(detection))
-
-            # Compare with remaining faces
-            for j, other_detection in enumerate(sorted_detections[i+1:], i+1):
-                if id(other_detection) in used:
-                    continue
-
-                # Calculate similarity
-                distance = face_recognition.face_distance(
-                    [detection.face_encoding],
-                    other_detection.face_encoding
-                )[0]
-
-                # If faces are similar enough, group them
-                # Use stricter threshold to avoid merging different people
-                if distance < self.face_grouping_threshold:  # Same person threshold (0.4)
-                    current_group.append(other_detection)
-                    used.add(id(other_detection))
+            # All unused faces similar enough to this one form a group
+            # Use stricter threshold to avoid merging different people
+            mates = np.flatnonzero(
+                (distance_matrix[i] < self.face_grouping_threshold) & ~used
+            )
+            used[mates] = True
 
-            groups.append(current_group)
+            groups.append([sorted_detections[j] for j in mates])
 
         # Log detailed grouping information
         logger.info(f"Face grouping results:")
@@ -987,10 +1344,22 @@ class FaceProcessor:
             return group[0]
 
         # Choose the detection with highest confidence
-        return max(group, key=lambda d: d.confidence)
+        confidences = np.fromiter(
+            (d.confidence for d in group), dtype=np.float64, count=len(group)
+        )
+        return group[int(np.argmax(confidences))]
 
-    def analyze_face_clustering_quality(self, face_detections: List[FaceDetection], groups: List[List[FaceDetection]]) -> Dict[str, float]:
-        """Analyze the quality of face clustering for debugging purposes"""
+    def analyze_face_clustering_quality(
+        self,
+        face_detections: List[FaceDetection],
+        groups: List[List[FaceDetection]],
+        encodings: Optional[np.ndarray] = None,
+    ) -> Dict[str, float]:
+        """Analyze the quality of face clustering for debugging purposes
+
+        encodings, if given, is the stack_encodings matrix in face_detections
+        order and is sliced instead of re-stacked.
+        """
         if not face_detections or not groups:
             return {}
 
@@ -1009,19 +1378,23 @@ class FaceProcessor:
         max_confidence = max(all_confidences)
 
         # Calculate inter-group distances (how different are the groups?)
-        inter_group_distances = []
-        for i, group1 in enumerate(groups):
-            best1 = self.get_best_detection_from_group(group1)
-            for j, group2 in enumerate(groups[i+1:], i+1):
-                best2 = self.get_best_detection_from_group(group2)
-                distance = face_recognition.face_distance(
-                    [best1.face_encoding],
-                    best2.face_encoding
-                )[0]
-                inter_group_distances.append(distance)
-
-        avg_inter_group_distance = sum(inter_group_distances) / len(inter_group_distances) if inter_group_distances else 0
-        min_inter_group_distance = min(inter_group_distances) if inter_group_distances else 0
+        # One vectorized pairwise pass over the best encoding of each group,
+        # then take the upper triangle instead of G^2 face_distance calls
+        best_detections = [self.get_best_detection_from_group(group) for group in groups]
+        if encodings is not None:
+            row_by_id = {id(d): i for i, d in enumerate(face_detections)}
+            best_encodings = encodings[[row_by_id[id(d)] for d in best_detections]]
+        else:
+            best_encodings = np.vstack(
+                [d.face_encoding for d in best_detections]
+            ).astype(np.float32)
+        distance_matrix = np.linalg.norm(
+            best_encodings[:, None, :] - best_encodings[None, :, :], axis=-1
+        )
+        inter_group_distances = distance_matrix[np.triu_indices(len(groups), 1)]
+
+        avg_inter_group_distance = float(inter_group_distances.mean()) if inter_group_distances.size else 0
+        min_inter_group_distance = float(inter_group_distances.min()) if inter_group_distances.size else 0
 
         stats = {
             "total_detections": total_detections,
@@ -1038,6 +1411,86 @@ class FaceProcessor:
 
         return stats
 
+# Per-process FaceProcessor for the analyze_video worker pool; dlib models are
+# loaded once per worker process instead of once per chunk
+_WORKER_FACE_PROCESSOR: Optional[FaceProcessor] = None
+
+
+def _init_chunk_worker():
+    global _WORKER_FACE_PROCESSOR
+    _WORKER_FACE_PROCESSOR = FaceProcessor()
+
+
+def _crop_face_to_b64(frame: np.ndarray, face_detection: FaceDetection) -> Optional[str]:
+    """Crop a face region from an already-decoded frame as a base64 JPEG"""
+    try:
+        top, right, bottom, left = face_detection.bbox
+
+        # Extract face region with some padding
+        padding = 30
+        face_img = frame[
+            max(0, top - padding):min(frame.shape[0], bottom + padding),
+            max(0, left - padding):min(frame.shape[1], right + padding)
+        ]
+
+        # Frames are BGR (OpenCV native), so the crop encodes directly with no
+        # colour conversion
+        _, img_encoded = cv2.imencode('.jpg', face_img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return base64.b64encode(img_encoded.tobytes()).decode('utf-8')
+
+    except Exception as e:
+        logger.error(f"Failed to extract face image: {str(e)}")
+        return None
+
+
+def _extract_face_image_from_chunk(
+    face_processor: FaceProcessor, chunk_data: bytes, face_detection: FaceDetection
+) -> Optional[str]:
+    """Extract face image from video chunk and return as base64 string"""
+    frames = face_processor.extract_frames_from_video_chunk(chunk_data)
+    if face_detection.frame_number < len(frames):
+        return _crop_face_to_b64(frames[face_detection.frame_number], face_detection)
+    return None
+
+
+def _process_chunk_faces(args: Tuple[int, bytes, float, float]):
+    """Worker for analyze_video: detect, group, and crop faces for one chunk
+
+    Runs in a multiprocessing pool so dlib detection/encoding can use all
+    cores. Matching and DB writes stay in the parent process, so only the
+    per-group best encodings and face crops cross the process boundary.
+    """
+    chunk_index, chunk_data, start_time, end_time = args
+    face_processor = _WORKER_FACE_PROCESSOR if _WORKER_FACE_PROCESSOR is not None else FaceProcessor()
+
+    # Decode the chunk exactly once; detection and the per-group face crops
+    # below all reuse this frame list
+    frames = face_processor.extract_frames_from_video_chunk(chunk_data)
+
+    face_detections = face_processor.process_video_chunk_faces(chunk_data, frames=frames)
+
+    # Stack the chunk's encodings once and share the matrix with grouping and
+    # clustering-quality analysis
+    encodings = face_processor.stack_encodings(face_detections) if face_detections else None
+    face_groups = face_processor.group_faces_in_chunk(face_detections, encodings=encodings)
+
+    clustering_stats = {}
+    if face_detections and face_groups:
+        clustering_stats = face_processor.analyze_face_clustering_quality(
+            face_detections, face_groups, encodings=encodings
+        )
+
+    group_results = []
+    for face_group in face_groups:
+        best_detection = face_processor.get_best_detection_from_group(face_group)
+        face_b64 = None
+        if best_detection.frame_number < len(frames):
+            face_b64 = _crop_face_to_b64(frames[best_detection.frame_number], best_detection)
+        group_results.append((best_detection.face_encoding, face_b64))
+
+    return chunk_index, start_time, end_time, clustering_stats, group_results
+
+
 class FacialRecognitionService:
     def __init__(
         self,
@@ -1047,42 +1500,132 @@ class FacialRecognitionService:
         self.video_chunker = VideoChunker(chunk_duration_seconds=5)
         self.supabase_client = supabase_client
 
+        # On-disk cache of photo-bytes-hash -> face encoding so profiles
+        # without a DB encoding aren't re-encoded with dlib on every run
+        self._encoding_cache_path = "/tmp/face_encodings_cache.pkl"
+        self._encoding_cache: Dict[str, np.ndarray] = {}
+        try:
+            if os.path.exists(self._encoding_cache_path):
+                with open(self._encoding_cache_path, "rb") as cache_file:
+                    self._encoding_cache = pickle.load(cache_file)
+                logger.info(f"Loaded {len(self._encoding_cache)} cached face encodings")
+        except Exception as e:
+            logger.warning(f"Could not load face encoding cache: {str(e)}")
+            self._encoding_cache = {}
+
+    def _encode_photo_cached(self, image_data: bytes) -> np.ndarray:
+        """Create a face encoding for photo bytes, cached by content hash"""
+        photo_hash = hashlib.sha256(image_data).hexdigest()
+        cached = self._encoding_cache.get(photo_hash)
+        if cached is not None:
+            logger.info(f"Face encoding cache hit for photo {photo_hash[:12]}")
+            return cached
+
+        face_encoding = self.face_processor.create_face_encoding_from_image(image_data)
+        self._encoding_cache[photo_hash] = face_encoding
+        self._save_encoding_cache()
+        return face_encoding
+
+    def _save_encoding_cache(self) -> None:
+        try:
+            with open(self._encoding_cache_path, "wb") as cache_file:
+                pickle.dump(self._encoding_cache, cache_file)
+        except Exception as e:
+            logger.warning(f"Could not persist face encoding cache: {str(e)}")
+
     def process_profile_inputs(
         self, profile_inputs: List[ServiceProfileInput]
     ) -> Dict[str, str]:  # profile_id -> status
-        """Process profile inputs to add/update face encodings from reference images"""
+        """Process profile inputs to add/update face encodings from reference images
+
+        Encoding is CPU-bound and independent per profile, so cache misses run
+        in a process pool; all successful profiles are stored with one batched
+        upsert instead of a round trip each.
+        """
         processing_results = {}
 
+        image_data_by_profile = {}
+        pending = []  # (profile_id, image_data, photo_hash) not found in cache
+        encodings = {}  # profile_id -> face encoding
+
         for profile_input in profile_inputs:
-            try:
-                # Handle both image data and image URLs
-                if hasattr(profile_input, 'image_data') and profile_input.image_data:
-                    image_data = profile_input.image_data
-                else:
-                    logger.error(f"Profile {profile_input.profile_id} has no image data or URL")
-                    processing_results[profile_input.profile_id] = "error: no image data"
-                    continue
+            # Handle both image data and image URLs
+            if hasattr(profile_input, 'image_data') and profile_input.image_data:
+                image_data = profile_input.image_data
+            else:
+                logger.error(f"Profile {profile_input.profile_id} has no image data or URL")
+                processing_results[profile_input.profile_id] = "error: no image data"
+                continue
 
-                # Create face encoding from image
-                face_encoding = self.face_processor.create_face_encoding_from_image(image_data)
+            image_data_by_profile[profile_input.profile_id] = image_data
 
-                # Convert image to base64 for storage
-                reference_image_b64 = base64.b64encode(image_data).decode('utf-8')
+            photo_hash = hashlib.sha256(image_data).hexdigest()
+            cached = self._encoding_cache.get(photo_hash)
+            if cached is not None:
+                logger.info(f"Face encoding cache hit for profile {profile_input.profile_id}")
+                encodings[profile_input.profile_id] = cached
+            else:
+                pending.append((profile_input.profile_id, image_data, photo_hash))
 
-                # Update profile with face data
-                self.supabase_client.upsert_profile_face_data(
-                    profile_id=profile_input.profile_id,
-                    face_encoding=face_encoding,
-                    reference_image=reference_image_b64,
-                )
+        # Encode cache misses; a pool only pays off with several photos
+        if len(pending) == 1:
+            profile_id, image_data, photo_hash = pending[0]
+            try:
+                encoding = self.face_processor.create_face_encoding_from_image(image_data)
+                encodings[profile_id] = encoding
+                self._encoding_cache[photo_hash] = encoding
+            except Exception as e:
+                logger.error(f"Failed to process profile {profile_id}: {str(e)}")
+                processing_results[profile_id] = f"error: {str(e)}"
+        elif pending:
+            # Threads, not processes: dlib releases the GIL inside detection
+            # and encoding, so this scales across cores without pickling the
+            # photo bytes to worker processes
+            num_workers = min(len(pending), multiprocessing.cpu_count())
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = {
+                    executor.submit(
+                        self.face_processor.create_face_encoding_from_image, image_data
+                    ): (profile_id, photo_hash)
+                    for profile_id, image_data, photo_hash in pending
+                }
+                for future in as_completed(futures):
+                    profile_id, photo_hash = futures[future]
+                    try:
+                        encoding = future.result()
+                        encodings[profile_id] = encoding
+                        self._encoding_cache[photo_hash] = encoding
+                    except Exception as e:
+                        logger.error(f"Failed to process profile {profile_id}: {str(e)}")
+                        processing_results[profile_id] = f"error: {str(e)}"
 
-                processing_results[profile_input.profile_id] = "success"
-                logger.info(f"Processed profile {profile_input.profile_id}")
+        if pending:
+            self._save_encoding_cache()
 
-            except Exception as e:
-                logger.error(f"Failed to process profile {profile_input.profile_id}: {str(e)}")
-                processing_results[profile_input.profile_id] = f"error: {str(e)}"
-                continue
+        # Store all successful profiles in one batched upsert
+        try:
+            now = datetime.now().isoformat()
+            rows = []
+            for profile_id, face_encoding in encodings.items():
+                encoding_b64 = base64.b64encode(pickle.dumps(face_encoding)).decode('utf-8')
+                reference_image_b64 = base64.b64encode(image_data_by_profile[profile_id]).decode('utf-8')
+                rows.append({
+                    "id": profile_id,
+                    "face_encoding": encoding_b64,
+                    "reference_image": reference_image_b64,
+                    "updated_at": now,
+                })
+
+            self.supabase_client.batch_upsert_profile_face_data(rows)
+
+            for profile_id in encodings:
+                processing_results[profile_id] = "success"
+                logger.info(f"Processed profile {profile_id}")
+
+        except Exception as e:
+            logger.error(f"Failed to store profile face data: {str(e)}")
+            for profile_id in encodings:
+                processing_results[profile_id] = f"error: {str(e)}"
 
         return processing_results
 
@@ -1144,7 +1687,7 @@ class FacialRecognitionService:
                         image_data = base64.b64decode(profile_photo.strip())
                         logger.info(f"Decoded base64 for profile {profile['id']}, size: {len(image_data)} bytes")
 
-                        face_encoding = self.face_processor.create_face_encoding_from_image(image_data)
+                        face_encoding = self._encode_photo_cached(image_data)
                         logger.info(f"Successfully created face encoding for profile {profile['id']}")
 
                         # Store the generated encoding in database
@@ -1174,6 +1717,11 @@ class FacialRecognitionService:
                 profile["id"]: profile for profile in profiles
             }
             logger.info(f"Loaded {len(profile_encodings)} profiles for matching")
+
+            # Stack the gallery once so per-face matching inside the chunk
+            # loop is a single vectorized distance computation
+            gallery = self.face_processor.build_profile_gallery(profile_encodings)
+
             if profile_encodings:
                 logger.info(f"🔍 Profile IDs available for matching: {list(profile_encodings.keys())}")
             else:
@@ -1185,67 +1733,80 @@ class FacialRecognitionService:
             logger.info(f"Created {len(chunks)} video chunks")
 
             # Step 3: Process each chunk for face detection and recognition
+            # Detection + encoding is chunk-independent and CPU-bound, so the
+            # heavy face work runs in a worker pool; matching and DB writes
+            # happen in this process against the precomputed gallery matrix
             chunk_results = []  # List of (chunk_index, detected_profile_ids)
             profile_face_images = defaultdict(list)  # profile_id -> [face_images]
+            video_profile_ids = set()  # profiles to link to this video, batched after the loop
 
-            for chunk_id, chunk_data, chunk_index, start_time, end_time in chunks:
-                logger.info(f"\n🎬 Processing chunk {chunk_index + 1}/{len(chunks)} (Time: {start_time:.1f}s - {end_time:.1f}s)")
-                logger.info(f"📊 Searching against {len(profile_encodings)} profiles with face encodings")
-
-                # Detect all faces in this chunk
-                face_detections = self.face_processor.process_video_chunk_faces(chunk_data)
-
-                # Group similar faces within the chunk to avoid duplicates
-                face_groups = self.face_processor.group_faces_in_chunk(face_detections)
-
-                # Analyze clustering quality for debugging
-                if face_detections and face_groups:
-                    clustering_stats = self.face_processor.analyze_face_clustering_quality(face_detections, face_groups)
-                    logger.info(f"  📈 Clustering stats: groups={clustering_stats.get('total_groups', 0)}, "
-                               f"efficiency={clustering_stats.get('grouping_efficiency', 0):.2f}, "
-                               f"avg_inter_distance={clustering_stats.get('avg_inter_group_distance', 0):.3f}")
-
-                # Process each unique face in the chunk
-                chunk_profile_ids = set()
-
-                for face_group_index, face_group in enumerate(face_groups):
-                    # Get the best detection from this group
-                    best_detection = self.face_processor.get_best_detection_from_group(face_group)
+            chunk_args = [
+                (chunk_index, chunk_data, start_time, end_time)
+                for chunk_id, chunk_data, chunk_index, start_time, end_time in chunks
+            ]
 
-                    # Extract face image as base64
-                    face_b64 = self._extract_face_image(chunk_data, best_detection)
+            num_workers = min(4, multiprocessing.cpu_count(), max(1, len(chunks)))
+            logger.info(f"Processing {len(chunks)} chunks with {num_workers} workers")
+
+            # Consume results as workers finish them so matching and the
+            # Supabase round-trips for one chunk overlap detection of the
+            # others instead of waiting for the whole pool to drain
+            with multiprocessing.Pool(
+                processes=num_workers, initializer=_init_chunk_worker
+            ) as pool:
+                for chunk_index, start_time, end_time, clustering_stats, group_results in pool.imap_unordered(
+                    _process_chunk_faces, chunk_args
+                ):
+                    logger.info(f"\n🎬 Processing chunk {chunk_index + 1}/{len(chunks)} (Time: {start_time:.1f}s - {end_time:.1f}s)")
+                    logger.info(f"📊 Searching against {len(profile_encodings)} profiles with face encodings")
+
+                    # Log clustering quality for debugging
+                    if clustering_stats:
+                        logger.info(f"  📈 Clustering stats: groups={clustering_stats.get('total_groups', 0)}, "
+                                   f"efficiency={clustering_stats.get('grouping_efficiency', 0):.2f}, "
+                                   f"avg_inter_distance={clustering_stats.get('avg_inter_group_distance', 0):.3f}")
+
+                    # Process each unique face in the chunk
+                    chunk_profile_ids = set()
+
+                    for face_group_index, (face_encoding, face_b64) in enumerate(group_results):
+                        # Try to match to existing profiles with detailed confidence logging
+                        match_result = self.face_processor.match_face_to_profiles_with_detailed_scores(
+                            gallery, face_encoding, chunk_index, face_group_index
+                        )
 
-                    # Try to match to existing profiles with detailed confidence logging
-                    match_result = self.face_processor.match_face_to_profiles_with_detailed_scores(
-                        best_detection.face_encoding, profile_encodings, chunk_index, face_group_index
-                    )
+                        if match_result:
+                            # Matched to existing profile
+                            chunk_profile_ids.add(match_result.profile_id)
+                            logger.info(f"Matched face to profile {match_result.profile_id} with confidence {match_result.confidence:.3f}")
 
-                    if match_result:
-                        # Matched to existing profile
-                        chunk_profile_ids.add(match_result.profile_id)
-                        logger.info(f"Matched face to profile {match_result.profile_id} with confidence {match_result.confidence:.3f}")
+                            # Store face image for this profile
+                            if face_b64:
+                                profile_face_images[match_result.profile_id].append(face_b64)
 
-                        # Store face image for this profile
-                        if face_b64:
-                            profile_face_images[match_result.profile_id].append(face_b64)
+                            # Link video to profile in one batched write after the loop
+                            video_profile_ids.add(match_result.profile_id)
 
-                        # Add video to profile's video list
-                        self.supabase_client.add_video_to_profile(match_result.profile_id, video_id)
+                    # Log chunk summary
+                    logger.info(f"\n📝 CHUNK {chunk_index} SUMMARY:")
+                    logger.info(f"   👥 Detected {len(group_results)} unique faces")
+                    logger.info(f"   ✅ Matched {len(chunk_profile_ids)} profiles: {list(chunk_profile_ids)}")
+                    logger.info(f"   ⏱️  Processing time: {start_time:.1f}s - {end_time:.1f}s\n")
 
-                # Log chunk summary
-                logger.info(f"\n📝 CHUNK {chunk_index} SUMMARY:")
-                logger.info(f"   👥 Detected {len(face_groups)} unique faces")
-                logger.info(f"   ✅ Matched {len(chunk_profile_ids)} profiles: {list(chunk_profile_ids)}")
-                logger.info(f"   ⏱️  Processing time: {start_time:.1f}s - {end_time:.1f}s\n")
+                    chunk_results.append((chunk_index, list(chunk_profile_ids)))
 
-                chunk_results.append((chunk_index, list(chunk_profile_ids)))
+            # Link this video to every matched profile in one batched write
+            # instead of one round trip per match per chunk
+            self.supabase_client.batch_add_video_to_profiles(video_id, list(video_profile_ids))
 
             # Step 4: Calculate interactions and frequency
             logger.info("Calculating interactions and frequencies")
-            interaction_results = self._calculate_profile_interactions(chunk_results, profile_face_images, profile_info)
+            interaction_results, co_appearance_pairs = self._calculate_profile_interactions(chunk_results, profile_face_images, profile_info)
 
             # Step 5: Track interactions between detected profiles AND with requester
+            # Accumulate all pairs locally and flush them in one batched RPC
             detected_profile_ids = list(interaction_results.keys())
+            interaction_pairs = []
 
             # First, create interactions between requester and all detected profiles
             # (The requester uploaded the video, so they interacted with everyone in it)
@@ -1254,8 +1815,11 @@ class FacialRecognitionService:
                     # Get the total chunks this profile appeared in as interaction strength
                     profile_chunks = interaction_results[detected_profile_id].chunk_appearances
 
-                    # Upsert interaction between requester and detected profile
-                    self.supabase_client.upsert_interaction(requester_user_id, detected_profile_id, profile_chunks)
+                    interaction_pairs.append({
+                        "uid1": requester_user_id,
+                        "uid2": detected_profile_id,
+                        "increment_by": profile_chunks,
+                    })
                     new_interactions.append({
                         "profile_1": requester_user_id,
                         "profile_2": detected_profile_id,
@@ -1264,22 +1828,24 @@ class FacialRecognitionService:
                     })
                     logger.info(f"Recorded {profile_chunks} interactions between requester {requester_user_id} and detected profile {detected_profile_id}")
 
-            # Then, track interactions between detected profiles (existing logic)
-            for i, profile_id_1 in enumerate(detected_profile_ids):
-                for profile_id_2 in detected_profile_ids[i + 1:]:
-                    # Calculate how many chunks they appeared together in
-                    shared_chunks = interaction_results[profile_id_1].interactions.get(profile_id_2, 0)
-
-                    if shared_chunks > 0:
-                        # Upsert interaction in database
-                        self.supabase_client.upsert_interaction(profile_id_1, profile_id_2, shared_chunks)
-                        new_interactions.append({
-                            "profile_1": profile_id_1,
-                            "profile_2": profile_id_2,
-                            "shared_chunks": shared_chunks,
-                            "interaction_type": "detected_with_detected"
-                        })
-                        logger.info(f"Recorded {shared_chunks} interactions between {profile_id_1} and {profile_id_2}")
+            # Then, track interactions between detected profiles using the
+            # pairs already counted in _calculate_profile_interactions
+            for profile_id_1, profile_id_2, shared_chunks in co_appearance_pairs:
+                interaction_pairs.append({
+                    "uid1": profile_id_1,
+                    "uid2": profile_id_2,
+                    "increment_by": shared_chunks,
+                })
+                new_interactions.append({
+                    "profile_1": profile_id_1,
+                    "profile_2": profile_id_2,
+                    "shared_chunks": shared_chunks,
+                    "interaction_type": "detected_with_detected"
+                })
+                logger.info(f"Recorded {shared_chunks} interactions between {profile_id_1} and {profile_id_2}")
+
+            # One round trip for all interaction upserts
+            self.supabase_client.batch_upsert_interactions(interaction_pairs)
 
             # Step 6: Store analysis results in database
             analysis_data = {
@@ -1309,33 +1875,17 @@ class FacialRecognitionService:
 
     def _extract_face_image(self, chunk_data: bytes, face_detection: FaceDetection) -> Optional[str]:
         """Extract face image from video chunk and return as base64 string"""
-        try:
-            frames = self.face_processor.extract_frames_from_video_chunk(chunk_data)
-            if face_detection.frame_number < len(frames):
-                frame = frames[face_detection.frame_number]
-                top, right, bottom, left = face_detection.bbox
-
-                # Extract face region with some padding
-                padding = 30
-                face_img = frame[
-                    max(0, top - padding):min(frame.shape[0], bottom + padding),
-                    max(0, left - padding):min(frame.shape[1], right + padding)
-                ]
-
-                # Convert to base64
-                import cv2
-                _, img_encoded = cv2.imencode('.jpg', cv2.cvtColor(face_img, cv2.COLOR_RGB2BGR))
-                face_b64 = base64.b64encode(img_encoded.tobytes()).decode('utf-8')
-                return face_b64
-
-        except Exception as e:
-            logger.error(f"Failed to extract face image: {str(e)}")
-            return None
+        return _extract_face_image_from_chunk(self.face_processor, chunk_data, face_detection)
 
     def _calculate_profile_interactions(
         self, chunk_results: List[Tuple[int, List[str]]], profile_face_images: Dict[str, List[str]], profile_info: Dict[str, Dict]
-    ) -> Dict[str, InteractionResult]:
-        """Calculate interaction frequencies between profiles and include face images"""
+    ) -> Tuple[Dict[str, InteractionResult], List[Tuple[str, str, int]]]:
+        """Calculate interaction frequencies between profiles and include face images
+
+        Also returns the co-appearance counts as a flat (profile_1, profile_2,
+        count) list with each pair listed once, so the caller doesn't need a
+        second pass over all profile pairs to rebuild them.
+        """
         # Count appearances per profile
         profile_appearances = defaultdict(int)
         # Count co-appearances between profiles
@@ -1370,7 +1920,15 @@ class FacialRecognitionService:
                 face_images=face_images,
             )
 
-        return results
+        # Flatten the co-appearance counts once; a < b keeps each pair unique
+        interaction_pairs = [
+            (profile_id1, profile_id2, count)
+            for profile_id1, inner in profile_interactions.items()
+            for profile_id2, count in inner.items()
+            if profile_id1 < profile_id2
+        ]
+
+        return results, interaction_pairs
 
 app = modal.App("facial-recognition-api")
 
@@ -1381,17 +1939,19 @@ image = (
     .pip_install(
         "boto3",
         "requests",
+        "httpx[http2]",
         "fastapi",
+        "orjson",
         "python-multipart",
         "numpy",
-        "opencv-python",
-        "face-recognition",
+        # headless build: no X11 libs, ~100 MB smaller image for a server
+        "opencv-python-headless",
+        "face-recognition",  # pulls in dlib
         "supabase",
-        "dlib",
+        "faiss-cpu",
         "uvicorn",
         "pytest",
         "pytest-asyncio",
-        "opencv-python",
     )
 )
 
@@ -1411,10 +1971,20 @@ supabase_secret = modal.Secret.from_name(
     min_containers=1,
     max_containers=4,  # Allow scaling for concurrent requests
     scaledown_window=300,  # Keep containers warm for 5 minutes
+    # Serve multiple async requests per container instead of booting a new
+    # container per concurrent request; the I/O-bound endpoints just await,
+    # and the heavy paths already run on the threadpool
+    allow_concurrent_inputs=16,
 )
 @modal.asgi_app()
 def fastapi_app():
-    web_app = FastAPI(title="Facial Recognition API", version="1.0.0")
+    # orjson serializes the list-of-dicts payloads (interactions, profiles)
+    # several times faster than the stdlib encoder
+    web_app = FastAPI(
+        title="Facial Recognition API",
+        version="1.0.0",
+        default_response_class=ORJSONResponse,
+    )
 
     # Add CORS middleware to allow all origins
     web_app.add_middleware(
@@ -1425,6 +1995,10 @@ def fastapi_app():
         allow_headers=["*"],  # Allows all headers
     )
 
+    # /interactions can return multi-MB of highly compressible JSON (base64
+    # face images); gzip it on the wire for clients that accept it
+    web_app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
     # Initialize services
     supabase_client = SupabaseClient(
         supabase_url=os.environ["SUPABASE_URL"],
@@ -1435,6 +2009,44 @@ def fastapi_app():
         supabase_client=supabase_client,
     )
 
+    # Warm dlib at container boot: force the detector/encoder model loads and
+    # the BLAS thread-pool allocation now, so the first real request doesn't
+    # pay the several-second deserialization penalty
+    try:
+        warmup_frame = np.zeros((64, 64, 3), dtype=np.uint8)
+        face_recognition.face_locations(warmup_frame, model="hog")
+        logger.info("dlib warmup complete")
+    except Exception as e:
+        logger.warning(f"dlib warmup failed: {str(e)}")
+
+    # Resolve the PostgREST base URL once per container; the env vars never
+    # change for the life of the process, so no per-request environ lookups
+    pgrest_base_url = f"{os.environ['SUPABASE_URL']}/rest/v1"
+
+    # One pooled async client for all PostgREST calls: keep-alive connections
+    # to Supabase instead of a TCP/TLS handshake per request, and no event-loop
+    # blocking in the async handlers
+    http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=40, max_connections=120),
+        headers={
+            "apikey": os.environ["SUPABASE_SERVICE_KEY"],
+            "Authorization": f"Bearer {os.environ['SUPABASE_SERVICE_KEY']}",
+        },
+    )
+
+    @web_app.on_event("shutdown")
+    async def close_http_client():
+        await http_client.aclose()
+
+    # Profile metadata changes rarely but /profiles is hit on every dashboard
+    # refresh; serve repeats from a short in-process TTL cache. The lock makes
+    # concurrent misses single-flight so only one request hits Supabase
+    profiles_cache: Dict[str, Any] = {"data": None, "expires": 0.0}
+    profiles_cache_lock = asyncio.Lock()
+    PROFILES_CACHE_TTL = 30.0  # seconds
+
     @web_app.post("/analyze-video", response_model=AnalyzeVideoResponse)
     async def analyze_video(request: AnalyzeVideoRequest):
         """
@@ -1450,8 +2062,10 @@ def fastapi_app():
             else:
                 logger.info("Searching against all profiles with face data")
 
-            # Analyze video
-            video_id, total_chunks, results, new_interactions = facial_recognition_service.analyze_video(
+            # Analyze video on a worker thread so the long-running job doesn't
+            # block the event loop for other requests
+            video_id, total_chunks, results, new_interactions = await run_in_threadpool(
+                facial_recognition_service.analyze_video,
                 requester_user_id=request.requester_user_id,
                 video_url=request.video_url,
                 target_profile_ids=request.target_profiles,
@@ -1486,12 +2100,23 @@ def fastapi_app():
     async def list_profiles():
         """List all profiles from Supabase"""
         try:
-            url = f"{os.environ['SUPABASE_URL']}/rest/v1/profiles_images?select=id%2Cname%2Cemail%2Cprofile_photo&apikey={os.environ['SUPABASE_SERVICE_KEY']}"
+            if profiles_cache["data"] is not None and time.monotonic() < profiles_cache["expires"]:
+                return profiles_cache["data"]
 
-            response = requests.get(url)
-            response.raise_for_status()
+            async with profiles_cache_lock:
+                # Re-check after acquiring the lock: another request may have
+                # refreshed the cache while we waited
+                if profiles_cache["data"] is not None and time.monotonic() < profiles_cache["expires"]:
+                    return profiles_cache["data"]
+
+                url = f"{pgrest_base_url}/profiles_images?select=id%2Cname%2Cemail%2Cprofile_photo"
 
-            return response.json()
+                response = await http_client.get(url)
+                response.raise_for_status()
+
+                profiles_cache["data"] = response.json()
+                profiles_cache["expires"] = time.monotonic() + PROFILES_CACHE_TTL
+                return profiles_cache["data"]
 
         except Exception as e:
             logger.error(f"Error fetching profiles: {str(e)}")
@@ -1501,15 +2126,18 @@ def fastapi_app():
     async def add_face_data_to_profile(profile_id: str, request: AddFaceDataRequest):
         """Add face encoding to a profile from base64 image data"""
         try:
-            # Decode base64 image data into bytes
-            # image_bytes = decode_image_base64_str(request.image_data.strip())
-            image_data = request.image_data.strip()
-            if request.image_data.startswith("data:image/jpeg;base64,"):
-                image_data = image_data[len("data:image/jpeg;base64,"):]
-            image_bytes = base64.b64decode(image_data)
+            # Strip any data-URI prefix and decode in one pass over the
+            # payload; partition finds "base64," without rescanning the
+            # multi-MB string twice like the old strip/startswith/slice combo
+            prefix, sep, b64_payload = request.image_data.partition("base64,")
+            image_bytes = await run_in_threadpool(
+                base64.b64decode, b64_payload if sep else request.image_data
+            )
             profile_input = ServiceProfileInput(profile_id=profile_id, image_data=image_bytes)
 
-            result = facial_recognition_service.process_profile_inputs([profile_input])
+            result = await run_in_threadpool(
+                facial_recognition_service.process_profile_inputs, [profile_input]
+            )
 
             return {
                 "profile_id": profile_id,
@@ -1525,8 +2153,11 @@ def fastapi_app():
     async def get_user_interactions(user_id: str):
         """Get all interactions for a specific user"""
         try:
-            # Use the database function to get interactions
-            result = supabase_client.client.rpc("get_user_interactions", {"uid": user_id}).execute()
+            # Use the database function to get interactions; the supabase
+            # client is synchronous, so keep the round trip off the event loop
+            result = await run_in_threadpool(
+                supabase_client.client.rpc("get_user_interactions", {"uid": user_id}).execute
+            )
 
             return {
                 "user_id": user_id,
@@ -1537,8 +2168,15 @@ def fastapi_app():
             logger.error(f"Error getting user interactions: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
+    # Profile columns a client may request via the fields parameter;
+    # reference_image in particular is a large base64 blob worth skipping
+    INTERACTION_PROFILE_FIELDS = ("id", "name", "email", "profile_photo", "reference_image", "video_ids")
+
     @web_app.get("/interactions")
-    async def get_all_interactions(user_id: Optional[str] = Query(None, description="Filter interactions for a specific user")):
+    async def get_all_interactions(
+        user_id: Optional[str] = Query(None, description="Filter interactions for a specific user"),
+        fields: Optional[str] = Query(None, description="Comma-separated profile fields to include (default: all)"),
+    ):
         """Get interactions with full profile details for both users. Optionally filter by user_id."""
         try:
             if user_id:
@@ -1546,111 +2184,62 @@ def fastapi_app():
             else:
                 logger.info("Fetching all interactions with profile details")
 
-            # Use direct HTTP call with PostgREST
-            import requests
-            base_url = f"{os.environ['SUPABASE_URL']}/rest/v1"
-            headers = {
-                "apikey": os.environ["SUPABASE_SERVICE_KEY"],
-                "Authorization": f"Bearer {os.environ['SUPABASE_SERVICE_KEY']}",
-                "Content-Type": "application/json"
-            }
+            # Let clients trim the embedded profile columns server-side so
+            # unwanted large fields never leave the database
+            profile_fields = ",".join(INTERACTION_PROFILE_FIELDS)
+            if fields:
+                requested = {f.strip() for f in fields.split(",")}
+                selected = [f for f in INTERACTION_PROFILE_FIELDS if f in requested]
+                if selected:
+                    profile_fields = ",".join(selected)
+
+            # Single embedded-resource query: PostgREST joins profiles_images
+            # for both users server-side, so there's no second round trip and
+            # no Python-side profile lookup/enrichment loop
+            interactions_query = (
+                f"{pgrest_base_url}/interactions"
+                "?select=id,interaction_count,created_at,updated_at,"
+                f"user1:profiles_images!user_id_1({profile_fields}),"
+                f"user2:profiles_images!user_id_2({profile_fields})"
+                "&order=updated_at.desc"
+            )
 
-            # Build the interactions query with optional user filtering
-            interactions_query = f"{base_url}/interactions?select=*&order=updated_at.desc"
-            
             if user_id:
                 # Filter interactions where user_id is in either user_id_1 or user_id_2
                 # Using PostgREST's "or" filter syntax
                 interactions_query += f"&or=(user_id_1.eq.{user_id},user_id_2.eq.{user_id})"
 
-            # Get interactions (filtered or all)
-            interactions_response = requests.get(interactions_query, headers=headers)
+            interactions_response = await http_client.get(interactions_query)
             interactions_response.raise_for_status()
-            interactions_data = interactions_response.json()
+            enriched_interactions = interactions_response.json()
 
             if user_id:
-                logger.info(f"Retrieved {len(interactions_data)} interactions for user {user_id}")
+                logger.info(f"Retrieved {len(enriched_interactions)} interactions for user {user_id}")
             else:
-                logger.info(f"Retrieved {len(interactions_data)} total interactions")
+                logger.info(f"Retrieved {len(enriched_interactions)} total interactions")
 
-            if not interactions_data:
+            if not enriched_interactions:
                 return {
                     "total_interactions": 0,
                     "interactions": [],
                     "filtered_by_user": user_id
                 }
 
-            # Get all unique user IDs from the filtered interactions
-            user_ids = set()
-            for interaction in interactions_data:
-                user_ids.add(interaction['user_id_1'])
-                user_ids.add(interaction['user_id_2'])
-
-            # Only fetch profiles for users that appear in the filtered interactions
-            user_ids_list = list(user_ids)
-            if user_ids_list:
-                # Build query to fetch only the needed profiles
-                profiles_query = f"{base_url}/profiles_images?select=id,name,email,profile_photo,reference_image,video_ids"
-                # Use PostgREST's "in" filter to get only the profiles we need
-                user_ids_param = ",".join(user_ids_list)
-                profiles_query += f"&id=in.({user_ids_param})"
-                
-                profiles_response = requests.get(profiles_query, headers=headers)
-                profiles_response.raise_for_status()
-                profiles_data = profiles_response.json()
-                
-                logger.info(f"Retrieved {len(profiles_data)} profiles for {len(user_ids_list)} unique users")
-            else:
-                profiles_data = []
-
-            # Create a lookup dictionary for profiles
-            profiles_lookup = {profile['id']: profile for profile in profiles_data}
-
-            # Build the final result with joined data
-            enriched_interactions = []
-            for interaction in interactions_data:
-                user1_id = interaction['user_id_1']
-                user2_id = interaction['user_id_2']
-
-                user1_profile = profiles_lookup.get(user1_id, {})
-                user2_profile = profiles_lookup.get(user2_id, {})
-
-                enriched_interaction = {
-                    "id": interaction['id'],
-                    "interaction_count": interaction['interaction_count'],
-                    "created_at": interaction['created_at'],
-                    "updated_at": interaction['updated_at'],
-                    "user1": {
-                        "id": user1_id,
-                        "name": user1_profile.get('name'),
-                        "email": user1_profile.get('email'),
-                        "profile_photo": user1_profile.get('profile_photo'),
-                        "reference_image": user1_profile.get('reference_image'),
-                        "video_ids": user1_profile.get('video_ids', [])
-                    },
-                    "user2": {
-                        "id": user2_id,
-                        "name": user2_profile.get('name'),
-                        "email": user2_profile.get('email'),
-                        "profile_photo": user2_profile.get('profile_photo'),
-                        "reference_image": user2_profile.get('reference_image'),
-                        "video_ids": user2_profile.get('video_ids', [])
-                    }
-                }
-                enriched_interactions.append(enriched_interaction)
-
-            logger.info(f"Successfully enriched {len(enriched_interactions)} interactions with profile data")
-
-            result = {
-                "total_interactions": len(enriched_interactions),
-                "interactions": enriched_interactions
-            }
-            
-            # Add filter information to response
-            if user_id:
-                result["filtered_by_user"] = user_id
-                
-            return result
+            # Stream the rows instead of materializing one big serialized
+            # payload: each interaction is orjson-encoded and flushed as it's
+            # walked, keeping the serialization working set to one row
+            async def stream_result():
+                yield b'{"total_interactions":' + str(len(enriched_interactions)).encode()
+                if user_id:
+                    yield b',"filtered_by_user":' + orjson.dumps(user_id)
+                yield b',"interactions":['
+                for i, interaction in enumerate(enriched_interactions):
+                    if i:
+                        yield b","
+                    yield orjson.dumps(interaction)
+                yield b"]}"
+
+            return StreamingResponse(stream_result(), media_type="application/json")
 
         except Exception as e:
             logger.error(f"Error fetching interactions: {str(e)}")
@@ -1685,34 +2274,39 @@ def fastapi_app():
     return web_app
 
 
+ENDPOINT_HELP = """Facial Recognition API deployed!
+
+Endpoints:
+  POST /analyze-video - Analyze video against profiles database
+  GET /analysis/{video_id}?requester_user_id={user_id} - Get stored analysis
+  GET /profiles - List all profiles with face data
+  POST /profile/{profile_id}/add-face-data - Add face encoding to profile
+  GET /interactions/{user_id} - Get user interactions
+  GET /interactions?user_id={user_id} - Get interactions with profile details, optionally filtered by user
+  GET /interactions - Get all interactions with profile details
+  GET /health - Health check
+  GET /test-base64 - Test base64 decoding functionality
+
+Example usage:
+  curl -X POST {url}/analyze-video \\
+    -H 'Content-Type: application/json' \\
+    -d '{
+      "requester_user_id": "user123",
+      "video_url": "https://storage.googleapis.com/bucket/video.mp4",
+      "target_profiles": ["profile1", "profile2"] // optional
+    }'
+
+  curl -X POST {url}/profile/profile123/add-face-data \\
+    -H 'Content-Type: application/json' \\
+    -d '{
+      "image_data": "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQ..."
+    }'
+
+  curl {url}/interactions/user123
+  curl '{url}/interactions?user_id=user123'  # Get interactions for specific user with full profile details
+  curl {url}/interactions  # Get all interactions with full profile details"""
+
+
 @app.local_entrypoint()
 def main():
-    print("Facial Recognition API deployed!")
-    print("\nEndpoints:")
-    print("  POST /analyze-video - Analyze video against profiles database")
-    print("  GET /analysis/{video_id}?requester_user_id={user_id} - Get stored analysis")
-    print("  GET /profiles - List all profiles with face data")
-    print("  POST /profile/{profile_id}/add-face-data - Add face encoding to profile")
-    print("  GET /interactions/{user_id} - Get user interactions")
-    print("  GET /interactions?user_id={user_id} - Get interactions with profile details, optionally filtered by user")
-    print("  GET /interactions - Get all interactions with profile details")
-    print("  GET /health - Health check")
-    print("  GET /test-base64 - Test base64 decoding functionality")
-    print("\nExample usage:")
-    print("  curl -X POST {url}/analyze-video \\")
-    print("    -H 'Content-Type: application/json' \\")
-    print("    -d '{")
-    print("      \"requester_user_id\": \"user123\",")
-    print("      \"video_url\": \"https://storage.googleapis.com/bucket/video.mp4\",")
-    print("      \"target_profiles\": [\"profile1\", \"profile2\"] // optional")
-    print("    }'")
-    print("")
-    print("  curl -X POST {url}/profile/profile123/add-face-data \\")
-    print("    -H 'Content-Type: application/json' \\")
-    print("    -d '{")
-    print("      \"image_data\": \"data:image/jpeg;base64,/9j/4AAQSkZJRgABAQ...\"")
-    print("    }'")
-    print("")
-    print("  curl {url}/interactions/user123")
-    print("  curl '{url}/interactions?user_id=user123'  # Get interactions for specific user with full profile details")
-    print("  curl {url}/interactions  # Get all interactions with full profile details")
\ No newline at end of file
+    print(ENDPOINT_HELP)
\ No newline at end of file
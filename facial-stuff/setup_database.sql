@@ -60,6 +60,23 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Create function to upsert many interactions in one round trip
+CREATE OR REPLACE FUNCTION batch_upsert_interactions(pairs JSONB)
+RETURNS VOID AS $$
+DECLARE
+    pair JSONB;
+BEGIN
+    FOR pair IN SELECT * FROM jsonb_array_elements(pairs)
+    LOOP
+        PERFORM upsert_interaction(
+            (pair->>'uid1')::UUID,
+            (pair->>'uid2')::UUID,
+            COALESCE((pair->>'increment_by')::INTEGER, 1)
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Create function to get user interactions
 CREATE OR REPLACE FUNCTION get_user_interactions(uid UUID)
 RETURNS TABLE (
@@ -1,9 +1,23 @@
 import modal
 import os
 import uuid
+import asyncio
+import tempfile
 import logging
 
+try:
+    # Swap the stdlib selector loop for uvloop before any event loop is
+    # created; the request handlers fan out many outbound calls (VLM,
+    # Whisper, GCS, Pinecone) per request and uvloop schedules them with
+    # far less overhead. No-op locally if uvloop isn't installed.
+    import uvloop
+
+    uvloop.install()
+except ImportError:
+    pass
+
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import ORJSONResponse
 
 from services.storage import StorageService
 from services.vector_db import VectorDBService
@@ -11,6 +25,7 @@ from services.video_processor import VideoProcessor
 from services.vlm_service import VLMService
 from services.transcription_service import TranscriptionService
 from services.facial_recognition import FacialRecognitionService
+from utils.constants import TEMP_DIR
 from models.schemas import (
     ProcessVideoResponse,
     ProcessPhotoResponse,
@@ -36,6 +51,10 @@ image = (
         "httpx",
         "pinecone",
         "fastapi",
+        "pydantic>=2",
+        "orjson",
+        "uvloop",
+        "httptools",
         "python-multipart",
         "numpy",
         "anthropic",
@@ -76,7 +95,9 @@ openai_secret = modal.Secret.from_name(
 )
 @modal.asgi_app()
 def fastapi_app():
-    web_app = FastAPI(title="Video Processing API")
+    # orjson cuts the serialization cost of the clip lists and their datetimes
+    # roughly in half versus the stdlib encoder
+    web_app = FastAPI(title="Video Processing API", default_response_class=ORJSONResponse)
 
     # Initialize services
     storage_service = StorageService(
@@ -87,10 +108,30 @@ def fastapi_app():
         api_key=os.environ["PINECONE_API_KEY"], index_host=os.environ["PINECONE_HOST"]
     )
     video_processor = VideoProcessor()
-    vlm_service = VLMService(api_key=os.environ["ANTHROPIC_API_KEY"])
-    transcription_service = TranscriptionService(api_key=os.environ["OPENAI_API_KEY"])
+    # Shared across containers: re-uploaded chunks/photos with identical
+    # content skip the LLM call on cache hit
+    vlm_description_cache = modal.Dict.from_name(
+        "vlm-description-cache", create_if_missing=True
+    )
+    vlm_service = VLMService(
+        api_key=os.environ["ANTHROPIC_API_KEY"],
+        description_cache=vlm_description_cache,
+    )
+    transcript_cache = modal.Dict.from_name(
+        "transcript-cache", create_if_missing=True
+    )
+    transcription_service = TranscriptionService(
+        api_key=os.environ["OPENAI_API_KEY"],
+        transcript_cache=transcript_cache,
+    )
     facial_recognition_service = FacialRecognitionService()
 
+    @web_app.on_event("shutdown")
+    async def shutdown_http_clients():
+        # Drain in-flight fire-and-forget requests and release the pooled
+        # connections before the container exits
+        await facial_recognition_service.aclose()
+
     @web_app.post("/process-photo", response_model=ProcessPhotoResponse)
     async def process_photo(user_id: str = Form(...), photo: UploadFile = File(...)):
         """Process and store a photo with AI-generated description"""
@@ -149,74 +190,188 @@ def fastapi_app():
     @web_app.post("/process-video", response_model=ProcessVideoResponse)
     async def process_video(user_id: str = Form(...), video: UploadFile = File(...)):
         """Process and store a video, splitting it into chunks"""
+        video_path = None
         try:
-            # Read video data
-            video_data = await video.read()
+            # Stream the upload to disk in fixed-size reads so the full video
+            # never sits in memory as one bytes object; ffmpeg reads the file
+            video_size = 0
+            with tempfile.NamedTemporaryFile(
+                suffix=".mp4", dir=TEMP_DIR, delete=False
+            ) as tmp:
+                video_path = tmp.name
+                while data := await video.read(1 << 20):
+                    tmp.write(data)
+                    video_size += len(data)
+
             logger.info(
-                f"Processing video for user {user_id}, size: {len(video_data)} bytes"
+                f"Processing video for user {user_id}, size: {video_size} bytes"
             )
 
             # Validate video
-            if not video_processor.validate_video(video_data):
+            if not video_processor.validate_video(video_path):
                 raise HTTPException(status_code=400, detail="Invalid video file")
 
             # Generate video ID
             video_id = str(uuid.uuid4())
 
-            # Split video into chunks
-            chunks = video_processor.split_video(video_data, video_id)
-            chunk_ids = []
+            # Split video into chunks; split_video yields on-disk chunk
+            # files, so only the chunks currently in a pipeline stage are
+            # ever read into memory
+            chunks = await asyncio.to_thread(
+                lambda: list(video_processor.split_video(video_path, video_id))
+            )
 
             logger.info(f"Generating transcriptions and descriptions for {len(chunks)} chunks")
 
-            # First, transcribe all chunks
-            logger.info("Transcribing video chunks...")
-            transcriptions = transcription_service.transcribe_batch(chunks)
-
-            # Process chunks with both transcription and VLM
-            previous_transcription = None
-            for i, (chunk_id, chunk_data, chunk_index, start_time, end_time) in enumerate(chunks):
-                # Get current transcription
-                current_transcription = transcriptions[i].get("text", "") if i < len(transcriptions) else ""
-
-                # Generate natural language description with transcription context
-                description = vlm_service.generate_description(
-                    video_chunk_data=chunk_data,
-                    chunk_index=chunk_index,
-                    start_time=start_time,
-                    end_time=end_time,
-                    video_filename=video.filename,
-                    current_transcription=current_transcription,
-                    previous_transcription=previous_transcription,
-                )
+            # Transcriptions run as their own bounded tasks so each chunk's
+            # VLM call can start as soon as its (and the previous chunk's)
+            # text lands, instead of waiting for the whole batch; end-to-end
+            # latency becomes max(transcription, VLM) rather than their sum
+            transcription_semaphore = asyncio.Semaphore(8)
+
+            async def transcribe_one(chunk):
+                (
+                    chunk_id,
+                    chunk_path,
+                    chunk_index,
+                    start_time,
+                    end_time,
+                    _frames,
+                    audio_path,
+                ) = chunk
+                async with transcription_semaphore:
+                    # The split pass already segmented the audio track, so
+                    # transcription reads the small ADTS file and skips both
+                    # the chunk mp4 read and the per-chunk ffmpeg demux;
+                    # audio-less sources fall back to the mp4 path
+                    if audio_path is not None:
+                        def read_audio():
+                            with open(audio_path, "rb") as audio_file:
+                                return audio_file.read()
+
+                        audio_data = await asyncio.to_thread(read_audio)
+                        return await transcription_service.transcribe_chunk_async(
+                            video_chunk_data=None,
+                            chunk_index=chunk_index,
+                            start_time=start_time,
+                            end_time=end_time,
+                            audio=(audio_data, "chunk.aac", "audio/aac"),
+                        )
 
-                # Combine description with transcription for searchability
-                combined_text = description
-                if current_transcription:
-                    combined_text += f" [Transcription: {current_transcription}]"
-
-                # Upload chunk to GCS
-                storage_service.upload_video_chunk(
-                    file_data=chunk_data,
-                    user_id=user_id,
-                    video_id=video_id,
-                    chunk_id=chunk_id,
-                    chunk_index=chunk_index,
-                )
+                    def read_chunk():
+                        with open(chunk_path, "rb") as chunk_file:
+                            return chunk_file.read()
 
-                # Store metadata in Pinecone with both description and transcription
-                vector_db_service.upsert_video_chunk(
-                    chunk_id=chunk_id,
-                    user_id=user_id,
-                    video_id=video_id,
-                    text=combined_text,
-                )
+                    chunk_data = await asyncio.to_thread(read_chunk)
+                    return await transcription_service.transcribe_chunk_async(
+                        video_chunk_data=chunk_data,
+                        chunk_index=chunk_index,
+                        start_time=start_time,
+                        end_time=end_time,
+                    )
+
+            transcription_tasks = [
+                asyncio.create_task(transcribe_one(chunk)) for chunk in chunks
+            ]
+
+            # Process chunks concurrently: each chunk's VLM call, GCS upload
+            # and Pinecone upsert are blocking I/O, so fanning out over the
+            # pre-batched transcriptions cuts wall-clock time roughly by the
+            # number of in-flight chunks. The semaphore bounds concurrency
+            chunk_semaphore = asyncio.Semaphore(8)
+
+            async def process_one_chunk(i, chunk):
+                (
+                    chunk_id,
+                    chunk_path,
+                    chunk_index,
+                    start_time,
+                    end_time,
+                    frame_paths,
+                    audio_path,
+                ) = chunk
+                async with chunk_semaphore:
+                    try:
+                        # Wait for this chunk's transcription before anything
+                        # else so the chunk file is never deleted mid-read
+                        current = await transcription_tasks[i]
+                        previous = await transcription_tasks[i - 1] if i > 0 else None
+                        current_transcription = current.get("text", "")
+                        previous_transcription = previous.get("text", "") if previous else None
+
+                        # The chunk file is read lazily here, so the semaphore
+                        # also bounds how many chunks sit in memory at once
+                        def read_chunk():
+                            with open(chunk_path, "rb") as chunk_file:
+                                return chunk_file.read()
+
+                        def read_frames():
+                            frames = []
+                            for frame_path in frame_paths:
+                                with open(frame_path, "rb") as frame_file:
+                                    frames.append(frame_file.read())
+                            return frames
+
+                        chunk_data = await asyncio.to_thread(read_chunk)
+                        # Sample frames were produced during the split decode
+                        # pass; handing them to the VLM avoids re-decoding the
+                        # chunk and shrinks the request payload to a few JPEGs
+                        keyframes = await asyncio.to_thread(read_frames)
+
+                        # Generate natural language description with transcription context
+                        description = await vlm_service.generate_description_async(
+                            video_chunk_data=chunk_data,
+                            chunk_index=chunk_index,
+                            start_time=start_time,
+                            end_time=end_time,
+                            video_filename=video.filename,
+                            current_transcription=current_transcription,
+                            previous_transcription=previous_transcription,
+                            keyframes=keyframes if keyframes else None,
+                        )
+
+                        # Combine description with transcription for searchability
+                        combined_text = description
+                        if current_transcription:
+                            combined_text += f" [Transcription: {current_transcription}]"
 
-                chunk_ids.append(chunk_id)
-                logger.info(f"Processed chunk {chunk_index + 1}/{len(chunks)}")
+                        # Upload chunk to GCS; the Pinecone upsert happens once,
+                        # batched, after all chunks finish
+                        await asyncio.to_thread(
+                            storage_service.upload_video_chunk,
+                            file_data=chunk_data,
+                            user_id=user_id,
+                            video_id=video_id,
+                            chunk_id=chunk_id,
+                            chunk_index=chunk_index,
+                        )
 
-                # Update previous transcription for next iteration
-                previous_transcription = current_transcription
+                        logger.info(f"Processed chunk {chunk_index + 1}/{len(chunks)}")
+                        return chunk_id, combined_text, chunk_index
+                    finally:
+                        # The chunk file has been uploaded (or failed); either
+                        # way it and its sample frames are no longer needed
+                        stale_paths = [chunk_path, *frame_paths]
+                        if audio_path is not None:
+                            stale_paths.append(audio_path)
+                        for stale_path in stale_paths:
+                            if os.path.exists(stale_path):
+                                os.remove(stale_path)
+
+            chunk_results = await asyncio.gather(
+                *[process_one_chunk(i, chunk) for i, chunk in enumerate(chunks)]
+            )
+            chunk_ids = [chunk_id for chunk_id, _, _ in chunk_results]
+
+            # One batched Pinecone upsert for all chunk metadata instead of a
+            # round trip per chunk
+            vector_rows = [
+                (chunk_id, user_id, video_id, combined_text, chunk_index)
+                for chunk_id, combined_text, chunk_index in chunk_results
+            ]
+            await asyncio.to_thread(
+                vector_db_service.upsert_video_chunks_batch, vector_rows
+            )
 
             # Calculate total duration
             total_duration = chunks[-1][4] if chunks else 0
@@ -229,7 +384,8 @@ def fastapi_app():
                         chunk_path = storage_service.get_chunk_path(
                             user_id=user_id,
                             video_id=video_id,
-                            chunk_id=chunk_id
+                            chunk_id=chunk_id,
+                            chunk_index=i,
                         )
                         # Generate presigned URL for facial recognition
                         video_url, _ = storage_service.generate_presigned_url(chunk_path)
@@ -255,6 +411,9 @@ def fastapi_app():
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            if video_path and os.path.exists(video_path):
+                os.remove(video_path)
 
     @web_app.post("/retrieve-clips", response_model=RetrieveClipsResponse)
     async def retrieve_clips(request: RetrieveClipsRequest):
@@ -265,32 +424,34 @@ def fastapi_app():
                 query_text=request.query, user_id=request.user_id, top_k=request.top_k
             )
 
-            # Generate presigned URLs for each clip
-            clips_with_urls = []
-            for clip in clips:
+            # Sign all clips concurrently; each may still involve an S3 round
+            # trip on the legacy key-lookup fallback
+            def sign_clip(clip):
                 # Reconstruct GCS path from metadata
-                logger.info(
-                    f"Getting chunk path for clip {clip['chunk_id'], clip['video_id'], request.user_id}"
-                )
                 gcs_path = storage_service.get_chunk_path(
                     user_id=request.user_id,
                     video_id=clip["video_id"],
                     chunk_id=clip["chunk_id"],
+                    chunk_index=clip.get("chunk_index"),
                 )
 
                 url, expires_at = storage_service.generate_presigned_url(gcs_path)
 
-                clips_with_urls.append(
-                    ClipWithUrl(
-                        chunk_id=clip["chunk_id"],
-                        score=clip["score"],
-                        user_id=clip["user_id"],
-                        video_id=clip["video_id"],
-                        url=url,
-                        expires_at=expires_at,
-                    )
+                return ClipWithUrl(
+                    chunk_id=clip["chunk_id"],
+                    score=clip["score"],
+                    user_id=clip["user_id"],
+                    video_id=clip["video_id"],
+                    url=url,
+                    expires_at=expires_at,
                 )
 
+            clips_with_urls = list(
+                await asyncio.gather(
+                    *[asyncio.to_thread(sign_clip, clip) for clip in clips]
+                )
+            )
+
             return RetrieveClipsResponse(
                 user_id=request.user_id, query=request.query, clips=clips_with_urls
             )
@@ -308,32 +469,33 @@ def fastapi_app():
                 query_text=request.query, user_id=request.user_id, top_k=request.top_k
             )
 
-            # Generate presigned URLs for each clip
-            clips_with_urls_and_descriptions = []
-            for clip in clips:
+            # Sign all clips concurrently, as in /retrieve-clips
+            def sign_clip(clip):
                 # Reconstruct GCS path from metadata
-                logger.info(
-                    f"Getting chunk path for clip {clip['chunk_id'], clip['video_id'], request.user_id}"
-                )
                 gcs_path = storage_service.get_chunk_path(
                     user_id=request.user_id,
                     video_id=clip["video_id"],
                     chunk_id=clip["chunk_id"],
+                    chunk_index=clip.get("chunk_index"),
                 )
 
                 url, expires_at = storage_service.generate_presigned_url(gcs_path)
 
-                clips_with_urls_and_descriptions.append(
-                    ClipWithDescription(
-                        chunk_id=clip["chunk_id"],
-                        score=clip["score"],
-                        user_id=clip["user_id"],
-                        video_id=clip["video_id"],
-                        description=clip["description"],
-                        url=url,
-                        expires_at=expires_at,
-                    )
+                return ClipWithDescription(
+                    chunk_id=clip["chunk_id"],
+                    score=clip["score"],
+                    user_id=clip["user_id"],
+                    video_id=clip["video_id"],
+                    description=clip["description"],
+                    url=url,
+                    expires_at=expires_at,
+                )
+
+            clips_with_urls_and_descriptions = list(
+                await asyncio.gather(
+                    *[asyncio.to_thread(sign_clip, clip) for clip in clips]
                 )
+            )
 
             return RetrieveClipsWithDescriptionsResponse(
                 user_id=request.user_id,
@@ -362,10 +524,14 @@ def fastapi_app():
     return web_app
 
 
+ENDPOINT_HELP = """Video Processing API skeleton deployed!
+
+Endpoints:
+  POST /process-video - Upload and process a video
+  POST /retrieve-clips - Search for clips with presigned URLs
+  GET /health - Health check"""
+
+
 @app.local_entrypoint()
 def main():
-    print("Video Processing API skeleton deployed!")
-    print("\nEndpoints:")
-    print("  POST /process-video - Upload and process a video")
-    print("  POST /retrieve-clips - Search for clips with presigned URLs")
-    print("  GET /health - Health check")
+    print(ENDPOINT_HELP)
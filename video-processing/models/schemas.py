@@ -1,9 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 
-class ProcessVideoResponse(BaseModel):
+class _FrozenModel(BaseModel):
+    """Base for the API schemas: immutable, unknown fields dropped
+
+    Pydantic v2 validates these in the Rust core; frozen models skip the
+    per-instance __dict__ mutation machinery and extra='ignore' avoids
+    validation errors on client payloads with surplus keys.
+    """
+
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+
+class ProcessVideoResponse(_FrozenModel):
     video_id: str
     user_id: str
     chunk_ids: List[str]
@@ -11,13 +22,13 @@ class ProcessVideoResponse(BaseModel):
     duration_seconds: float
 
 
-class RetrieveClipsRequest(BaseModel):
+class RetrieveClipsRequest(_FrozenModel):
     user_id: str
     query: str
     top_k: int = 10
 
 
-class ClipWithUrl(BaseModel):
+class ClipWithUrl(_FrozenModel):
     chunk_id: str
     score: float
     user_id: str
@@ -26,13 +37,13 @@ class ClipWithUrl(BaseModel):
     expires_at: datetime
 
 
-class RetrieveClipsResponse(BaseModel):
+class RetrieveClipsResponse(_FrozenModel):
     user_id: str
     query: str
     clips: List[ClipWithUrl]
 
 
-class ClipWithDescription(BaseModel):
+class ClipWithDescription(_FrozenModel):
     chunk_id: str
     score: float
     user_id: str
@@ -42,20 +53,20 @@ class ClipWithDescription(BaseModel):
     expires_at: datetime
 
 
-class RetrieveClipsWithDescriptionsResponse(BaseModel):
+class RetrieveClipsWithDescriptionsResponse(_FrozenModel):
     user_id: str
     query: str
     clips: List[ClipWithDescription]
 
 
-class ProcessPhotoResponse(BaseModel):
+class ProcessPhotoResponse(_FrozenModel):
     photo_id: str
     user_id: str
     description: str
     stored: bool
 
 
-class VideoChunkMetadata(BaseModel):
+class VideoChunkMetadata(_FrozenModel):
     chunk_id: str
     user_id: str
     video_id: str
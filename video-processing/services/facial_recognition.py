@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import httpx
 from typing import Optional, List
@@ -14,6 +15,39 @@ class FacialRecognitionService:
     def __init__(self):
         self.base_url = FACIAL_RECOGNITION_API_URL
         self.timeout = httpx.Timeout(5.0, connect=2.0)  # Short timeout for fire-and-forget
+        # One client for the container's lifetime: keep-alive connections skip
+        # the TCP+TLS handshake that a fresh AsyncClient per call pays
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        )
+        # Keep references to in-flight fire-and-forget tasks so they aren't
+        # garbage collected before completing
+        self._pending_tasks: set = set()
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client (call on app shutdown)"""
+        if self._pending_tasks:
+            await asyncio.gather(*self._pending_tasks, return_exceptions=True)
+        await self._client.aclose()
+
+    async def _send_analyze_request(self, endpoint: str, payload: dict, video_url: str) -> None:
+        try:
+            response = await self._client.post(
+                endpoint,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+            )
+
+            # Just log the status for monitoring
+            logger.info(f"Facial recognition request sent with status: {response.status_code}")
+
+        except httpx.TimeoutException:
+            # Log but don't fail - this is fire-and-forget
+            logger.warning(f"Facial recognition request timed out for video {video_url}")
+        except Exception as e:
+            # Log any errors but don't propagate them
+            logger.error(f"Failed to send video to facial recognition service: {str(e)}")
 
     async def analyze_video_async(
         self,
@@ -24,6 +58,9 @@ class FacialRecognitionService:
         """
         Send video for facial recognition analysis (fire-and-forget).
 
+        Schedules the request as a background task and returns immediately,
+        so callers never block on the facial recognition round trip.
+
         Args:
             user_id: The user ID who uploaded the video
             video_url: Public URL to the video file
@@ -39,24 +76,10 @@ class FacialRecognitionService:
         if target_profiles:
             payload["target_profiles"] = target_profiles
 
-        try:
-            # Fire-and-forget: we don't wait for or process the response
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                logger.info(f"Sending video {video_url} to facial recognition service for user {user_id}")
-
-                # We don't await the response fully - just ensure the request is sent
-                response = await client.post(
-                    endpoint,
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
+        logger.info(f"Sending video {video_url} to facial recognition service for user {user_id}")
 
-                # Just log the status for monitoring
-                logger.info(f"Facial recognition request sent with status: {response.status_code}")
-
-        except httpx.TimeoutException:
-            # Log but don't fail - this is fire-and-forget
-            logger.warning(f"Facial recognition request timed out for video {video_url}")
-        except Exception as e:
-            # Log any errors but don't propagate them
-            logger.error(f"Failed to send video to facial recognition service: {str(e)}")
\ No newline at end of file
+        task = asyncio.create_task(
+            self._send_analyze_request(endpoint, payload, video_url)
+        )
+        self._pending_tasks.add(task)
+        task.add_done_callback(self._pending_tasks.discard)
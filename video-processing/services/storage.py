@@ -1,7 +1,14 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import quote, urlparse
+import hashlib
+import hmac
+import time
 import logging
 from utils.constants import BUCKET_NAME, GCS_ENDPOINT_URL, PRESIGNED_URL_EXPIRY_SECONDS
 
@@ -17,9 +24,82 @@ class StorageService:
             aws_secret_access_key=access_key_secret,
             region_name="auto",
             use_ssl=True,
-            config=Config(signature_version="s3v4"),
+            config=Config(
+                signature_version="s3v4",
+                # Default urllib3 pool is 10 connections; concurrent presigned
+                # URL generation and chunk uploads serialize behind it
+                max_pool_connections=50,
+                retries={"max_attempts": 3, "mode": "adaptive"},
+            ),
         )
         self.bucket_name = BUCKET_NAME
+        # Large chunks upload as concurrent multipart parts instead of one
+        # serial PUT per chunk
+        self._transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            max_concurrency=8,
+            use_threads=True,
+        )
+        # Presigned URLs are pure HMAC work but add up per clip; reuse each
+        # signed URL for half its validity window
+        self._presigned_cache = {}  # object_key -> (url, expires_at, cache_deadline)
+        # Presigning inputs for the hand-rolled hot path: bucket, endpoint,
+        # region and expiry are fixed, so per URL only the key and timestamp
+        # vary (see _presign_get_url)
+        self._access_key_id = access_key_id
+        self._secret_access_key = access_key_secret
+        self._presign_endpoint = GCS_ENDPOINT_URL.rstrip("/")
+        self._presign_host = urlparse(GCS_ENDPOINT_URL).netloc
+        self._sigv4_key = None  # (date_stamp, derived signing key)
+
+    def _signing_key(self, date_stamp: str) -> bytes:
+        """Derive (and cache per day) the SigV4 signing key"""
+        if self._sigv4_key and self._sigv4_key[0] == date_stamp:
+            return self._sigv4_key[1]
+        key = f"AWS4{self._secret_access_key}".encode()
+        for msg in (date_stamp, "auto", "s3", "aws4_request"):
+            key = hmac.new(key, msg.encode(), hashlib.sha256).digest()
+        self._sigv4_key = (date_stamp, key)
+        return key
+
+    def _presign_get_url(self, object_key: str) -> str:
+        """Build a SigV4 presigned GET URL without going through boto3
+
+        boto3's presign path walks RequestSigner/SigV4QueryAuth — dozens of
+        Python calls per URL — to produce what is, for a fixed
+        bucket/endpoint/region/expiry, a constant template plus one HMAC.
+        This inlines that template; output matches boto3's path-style URLs.
+        """
+        now = datetime.utcnow()
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = amz_date[:8]
+        scope = f"{date_stamp}/auto/s3/aws4_request"
+
+        canonical_uri = f"/{self.bucket_name}/" + quote(object_key, safe="/-_.~")
+        # Query params are already in canonical (sorted) order
+        canonical_query = (
+            "X-Amz-Algorithm=AWS4-HMAC-SHA256"
+            f"&X-Amz-Credential={quote(f'{self._access_key_id}/{scope}', safe='')}"
+            f"&X-Amz-Date={amz_date}"
+            f"&X-Amz-Expires={PRESIGNED_URL_EXPIRY_SECONDS}"
+            "&X-Amz-SignedHeaders=host"
+        )
+        canonical_request = (
+            f"GET\n{canonical_uri}\n{canonical_query}\n"
+            f"host:{self._presign_host}\n\nhost\nUNSIGNED-PAYLOAD"
+        )
+        string_to_sign = (
+            "AWS4-HMAC-SHA256\n"
+            f"{amz_date}\n{scope}\n"
+            f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+        )
+        signature = hmac.new(
+            self._signing_key(date_stamp), string_to_sign.encode(), hashlib.sha256
+        ).hexdigest()
+        return (
+            f"{self._presign_endpoint}{canonical_uri}?{canonical_query}"
+            f"&X-Amz-Signature={signature}"
+        )
 
     def upload_video_chunk(
         self,
@@ -33,21 +113,17 @@ class StorageService:
         key = f"{user_id}/{video_id}/{chunk_index:04d}_{chunk_id}.mp4"
 
         try:
-            # Generate presigned URL for upload
-            presigned_url = self.s3_client.generate_presigned_url(
-                "put_object",
-                Params={"Bucket": self.bucket_name, "Key": key},
-                ExpiresIn=3600,
+            # Upload directly through the S3 client; the transfer config
+            # splits large chunks into parallel multipart uploads, which
+            # saturates outbound bandwidth where the old single presigned PUT
+            # pushed everything over one TCP connection
+            self.s3_client.upload_fileobj(
+                BytesIO(file_data),
+                self.bucket_name,
+                key,
+                Config=self._transfer_config,
             )
 
-            # Upload using the presigned URL
-            response = requests.put(presigned_url, data=file_data)
-
-            if response.status_code != 200:
-                raise Exception(
-                    f"Upload failed with status {response.status_code}: {response.text}"
-                )
-
             logger.info(f"Uploaded chunk {chunk_id} to {key}")
             return key
         except Exception as e:
@@ -57,57 +133,89 @@ class StorageService:
     def generate_presigned_url(self, object_key: str) -> tuple[str, datetime]:
         """Generate a presigned URL for downloading a video chunk"""
         try:
-            url = self.s3_client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": self.bucket_name, "Key": object_key},
-                ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS,
-            )
+            cached = self._presigned_cache.get(object_key)
+            if cached and time.monotonic() < cached[2]:
+                return cached[0], cached[1]
+
+            url = self._presign_get_url(object_key)
             expires_at = datetime.utcnow() + timedelta(
                 seconds=PRESIGNED_URL_EXPIRY_SECONDS
             )
+            self._presigned_cache[object_key] = (
+                url,
+                expires_at,
+                time.monotonic() + PRESIGNED_URL_EXPIRY_SECONDS / 2,
+            )
             return url, expires_at
         except Exception as e:
             logger.error(f"Failed to generate presigned URL for {object_key}: {str(e)}")
             raise
 
-    def get_chunk_path(self, user_id: str, video_id: str, chunk_id: str) -> str:
-        """Get the GCS path for a chunk given its IDs"""
+    def get_chunk_path(
+        self,
+        user_id: str,
+        video_id: str,
+        chunk_id: str,
+        chunk_index: Optional[int] = None,
+    ) -> str:
+        """Get the GCS path for a chunk given its IDs
+
+        The key layout is deterministic, so when the caller knows chunk_index
+        the key is rebuilt locally; the ListObjectsV2 scan only remains as a
+        fallback for chunks stored before the index was tracked.
+        """
+        if chunk_index is not None:
+            return f"{user_id}/{video_id}/{int(chunk_index):04d}_{chunk_id}.mp4"
+
         prefix = f"{user_id}/{video_id}/"
 
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name, Prefix=prefix
-            )
-
-            if "Contents" not in response:
+            found_any = False
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get("Contents", []):
+                    found_any = True
+                    if chunk_id in obj["Key"]:
+                        return obj["Key"]
+
+            if not found_any:
                 raise ValueError(f"No chunks found for video {video_id}")
 
-            for obj in response["Contents"]:
-                if chunk_id in obj["Key"]:
-                    return obj["Key"]
-
             raise ValueError(f"Chunk {chunk_id} not found")
         except Exception as e:
             logger.error(f"Failed to get chunk path: {str(e)}")
             raise
 
     def delete_video_chunks(self, user_id: str, video_id: str) -> int:
-        """Delete all chunks for a given video"""
+        """Delete all chunks for a given video
+
+        list_objects_v2 pages at 1000 keys and delete_objects accepts at most
+        1000 per call, so both are paginated/batched; delete batches run in
+        parallel and Quiet mode skips the per-key success entries in the
+        response.
+        """
         prefix = f"{user_id}/{video_id}/"
 
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name, Prefix=prefix
-            )
-
-            if "Contents" not in response:
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            objects = [
+                {"Key": obj["Key"]}
+                for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+                for obj in page.get("Contents", [])
+            ]
+
+            if not objects:
                 return 0
 
-            objects = [{"Key": obj["Key"]} for obj in response["Contents"]]
+            def delete_batch(batch):
+                self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": batch, "Quiet": True},
+                )
 
-            self.s3_client.delete_objects(
-                Bucket=self.bucket_name, Delete={"Objects": objects}
-            )
+            batches = [objects[i : i + 1000] for i in range(0, len(objects), 1000)]
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(delete_batch, batches))
 
             deleted_count = len(objects)
             logger.info(f"Deleted {deleted_count} chunks for video {video_id}")
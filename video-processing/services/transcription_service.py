@@ -1,169 +1,413 @@
-import tempfile
+import asyncio
+import hashlib
 import os
 import subprocess
 import logging
-from typing import Optional, Dict, Any
-import uuid
-from openai import OpenAI
-from utils.constants import TEMP_DIR
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional, Dict, Any, List, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from utils.rate_limit import TokenBucket, backoff_delay
 
 logger = logging.getLogger(__name__)
 
+# AAC sources — the normal mp4 case — stream-copy to ADTS with no decode or
+# encode at all; trying this first stands in for a codec probe, since the
+# adts muxer fails fast on non-AAC
+_AAC_COPY_CMD = [
+    "ffmpeg",
+    "-i",
+    "pipe:0",
+    "-vn",  # No video
+    "-c:a",
+    "copy",
+    "-f",
+    "adts",
+    "pipe:1",
+]
+
+# Fallback for non-AAC tracks: 16 kHz mono Opus at 24 kbps, ~4x smaller
+# than 128 kbps MP3
+_OPUS_CMD = [
+    "ffmpeg",
+    "-i",
+    "pipe:0",
+    "-vn",
+    "-c:a",
+    "libopus",
+    "-b:a",
+    "24k",
+    "-ar",
+    "16000",  # Sample rate optimized for speech
+    "-ac",
+    "1",
+    "-f",
+    "ogg",
+    "pipe:1",
+]
+
 
 class TranscriptionService:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, transcript_cache=None):
+        # Pool connections across the concurrent chunk transcriptions so
+        # parallel Whisper calls reuse TLS sessions instead of handshaking
+        # per request
+        limits = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+        self.client = OpenAI(
+            api_key=api_key,
+            http_client=httpx.Client(timeout=60.0, limits=limits),
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=httpx.AsyncClient(timeout=60.0, limits=limits),
+        )
+        # Optional dict-like cache (e.g. modal.Dict) keyed by chunk content
+        # hash; repeated content (splash screens, re-uploads) skips both the
+        # ffmpeg audio extraction and the Whisper call
+        self.transcript_cache = transcript_cache
+        # Shared across all concurrent chunk transcriptions; keeps request
+        # throughput under Whisper's RPM ceiling instead of bursting into
+        # 429s and backing off
+        self._rate_limiter = TokenBucket(float(os.environ.get("WHISPER_RPM", 500)))
         logger.info("Initialized Transcription service with OpenAI Whisper API")
 
-    def extract_audio_from_video(self, video_data: bytes) -> bytes:
+    @staticmethod
+    def _transcript_cache_key(video_chunk_data: bytes) -> str:
+        return hashlib.blake2b(video_chunk_data, digest_size=16).hexdigest()
+
+    def _cache_get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        if self.transcript_cache is None:
+            return None
+        try:
+            return self.transcript_cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Transcript cache lookup failed: {str(e)}")
+            return None
+
+    def _cache_put(self, cache_key: str, payload: Dict[str, Any]) -> None:
+        if self.transcript_cache is None:
+            return
+        try:
+            self.transcript_cache[cache_key] = payload
+        except Exception as e:
+            logger.warning(f"Transcript cache store failed: {str(e)}")
+
+    def extract_audio_from_video(self, video_data: bytes) -> Tuple[bytes, str, str]:
         """
-        Extract audio from video chunk and return as MP3 bytes
+        Extract the audio track from a video chunk
+
+        Returns (audio_bytes, filename, content_type) for the Whisper
+        upload. All I/O is piped (chunks are muxed with faststart, which
+        keeps their mp4s demuxable from a pipe); AAC tracks stream-copy and
+        everything else transcodes to Opus, see _AAC_COPY_CMD/_OPUS_CMD.
         """
-        with tempfile.NamedTemporaryFile(
-            suffix=".mp4", dir=TEMP_DIR, delete=False
-        ) as input_file:
-            input_file.write(video_data)
-            input_file.flush()
-            input_path = input_file.name
-
-            audio_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}.mp3")
-
-            try:
-                cmd = [
-                    "ffmpeg",
-                    "-i",
-                    input_path,
-                    "-vn",  # No video
-                    "-acodec",
-                    "mp3",
-                    "-ab",
-                    "128k",  # Audio bitrate
-                    "-ar",
-                    "16000",  # Sample rate optimized for speech
-                    "-y",
-                    audio_path,
-                ]
-
-                result = subprocess.run(cmd, capture_output=True, check=True)
+        process = subprocess.Popen(
+            _AAC_COPY_CMD,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            # Whole-chunk pipes; a 1 MB buffer cuts the read/write syscall
+            # count versus the default pipe-sized buffering
+            bufsize=1024 * 1024,
+        )
+        audio_data, stderr = process.communicate(video_data)
+        if process.returncode == 0 and audio_data:
+            logger.info(f"Stream-copied AAC audio, size: {len(audio_data)} bytes")
+            return audio_data, "chunk.aac", "audio/aac"
 
-                with open(audio_path, "rb") as audio_file:
-                    audio_data = audio_file.read()
+        process = subprocess.Popen(
+            _OPUS_CMD,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=1024 * 1024,
+        )
+        audio_data, stderr = process.communicate(video_data)
 
-                logger.info(f"Extracted audio, size: {len(audio_data)} bytes")
-                return audio_data
+        if process.returncode != 0:
+            logger.error(f"Failed to extract audio: {stderr.decode()}")
+            raise subprocess.CalledProcessError(
+                process.returncode, _OPUS_CMD, output=audio_data, stderr=stderr
+            )
 
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Failed to extract audio: {e.stderr.decode()}")
-                raise
-            finally:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
+        logger.info(f"Transcoded audio to Opus, size: {len(audio_data)} bytes")
+        return audio_data, "chunk.ogg", "audio/ogg"
+
+    async def extract_audio_from_video_async(
+        self, video_data: bytes
+    ) -> Tuple[bytes, str, str]:
+        """Async variant of extract_audio_from_video
+
+        Uses asyncio subprocesses so the ffmpeg pipe never ties up a worker
+        thread; same copy-then-transcode strategy as the sync path.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *_AAC_COPY_CMD,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        audio_data, stderr = await process.communicate(video_data)
+        if process.returncode == 0 and audio_data:
+            logger.info(f"Stream-copied AAC audio, size: {len(audio_data)} bytes")
+            return audio_data, "chunk.aac", "audio/aac"
+
+        process = await asyncio.create_subprocess_exec(
+            *_OPUS_CMD,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        audio_data, stderr = await process.communicate(video_data)
+
+        if process.returncode != 0:
+            logger.error(f"Failed to extract audio: {stderr.decode()}")
+            raise subprocess.CalledProcessError(
+                process.returncode, _OPUS_CMD, output=audio_data, stderr=stderr
+            )
+
+        logger.info(f"Transcoded audio to Opus, size: {len(audio_data)} bytes")
+        return audio_data, "chunk.ogg", "audio/ogg"
+
+    @staticmethod
+    def _payload_from_response(response: Any) -> Dict[str, Any]:
+        """Chunk-relative view of a Whisper response
+
+        Word timestamps stay relative to the chunk, so the payload carries no
+        timeline position and can be cached and reused wherever the same
+        content appears.
+        """
+        words = []
+        if hasattr(response, 'words'):
+            words = [
+                {"word": w.word, "start": w.start, "end": w.end}
+                for w in response.words
+            ]
+        return {
+            "text": response.text if hasattr(response, 'text') else "",
+            "words": words,
+            "language": response.language if hasattr(response, 'language') else "unknown",
+        }
+
+    @staticmethod
+    def _result_from_payload(
+        payload: Dict[str, Any], chunk_index: int, start_time: float, end_time: float
+    ) -> Dict[str, Any]:
+        """Place a chunk-relative payload on the video timeline"""
+        return {
+            "text": payload["text"],
+            "chunk_index": chunk_index,
+            "start_time": start_time,
+            "end_time": end_time,
+            "words": [
+                {
+                    "word": w["word"],
+                    "start": w["start"] + start_time,  # Adjust to video timeline
+                    "end": w["end"] + start_time,
+                }
+                for w in payload["words"]
+            ],
+            "language": payload["language"],
+        }
+
+    @staticmethod
+    def _empty_result(
+        chunk_index: int, start_time: float, end_time: float, error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        result = {
+            "text": "",
+            "chunk_index": chunk_index,
+            "start_time": start_time,
+            "end_time": end_time,
+        }
+        if error is not None:
+            result["error"] = error
+        return result
 
     def transcribe_chunk(
         self,
-        video_chunk_data: bytes,
+        video_chunk_data: Optional[bytes],
         chunk_index: int,
         start_time: float,
         end_time: float,
+        audio: Optional[Tuple[bytes, str, str]] = None,
     ) -> Dict[str, Any]:
         """
         Transcribe audio from video chunk using OpenAI Whisper
         Returns dict with transcription text and metadata
+
+        Callers that already hold the chunk's audio (e.g. the ADTS segments
+        emitted by the split pass) pass it as `audio` = (bytes, filename,
+        content_type) and skip the per-chunk ffmpeg extraction here.
         """
         try:
-            # Extract audio from video
-            audio_data = self.extract_audio_from_video(video_chunk_data)
+            cache_key = self._transcript_cache_key(
+                audio[0] if audio is not None else video_chunk_data
+            )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.info(f"Transcript cache hit for chunk {chunk_index}")
+                return self._result_from_payload(
+                    cached, chunk_index, start_time, end_time
+                )
+
+            if audio is not None:
+                audio_data, filename, content_type = audio
+            else:
+                # Extract audio from video
+                audio_data, filename, content_type = self.extract_audio_from_video(
+                    video_chunk_data
+                )
 
             if not audio_data:
                 logger.warning(f"No audio extracted for chunk {chunk_index}")
-                return {
-                    "text": "",
-                    "chunk_index": chunk_index,
-                    "start_time": start_time,
-                    "end_time": end_time,
-                }
-
-            # Create temporary file for audio (Whisper API requires file)
-            with tempfile.NamedTemporaryFile(
-                suffix=".mp3", dir=TEMP_DIR, delete=False
-            ) as audio_file:
-                audio_file.write(audio_data)
-                audio_file.flush()
-                audio_path = audio_file.name
+                return self._empty_result(chunk_index, start_time, end_time)
 
+            # Upload the audio bytes directly; the Whisper client accepts a
+            # (name, fileobj, content-type) tuple, so no audio temp file.
+            # Back off on 429s so concurrent chunks don't give up under rate
+            # limiting
+            for attempt in range(5):
                 try:
-                    # Transcribe using Whisper API
-                    with open(audio_path, "rb") as f:
-                        response = self.client.audio.transcriptions.create(
-                            model="whisper-1",
-                            file=f,
-                            response_format="verbose_json",
-                            timestamp_granularities=["word", "segment"]
-                        )
-
-                    # Process response
-                    transcription_text = response.text if hasattr(response, 'text') else ""
-
-                    # Get word-level timestamps if available
-                    words = []
-                    if hasattr(response, 'words'):
-                        words = [
-                            {
-                                "word": w.word,
-                                "start": w.start + start_time,  # Adjust to video timeline
-                                "end": w.end + start_time,
-                            }
-                            for w in response.words
-                        ]
-
-                    result = {
-                        "text": transcription_text,
-                        "chunk_index": chunk_index,
-                        "start_time": start_time,
-                        "end_time": end_time,
-                        "words": words,
-                        "language": response.language if hasattr(response, 'language') else "unknown",
-                    }
-
-                    logger.info(
-                        f"Transcribed chunk {chunk_index}: {len(transcription_text)} chars"
+                    self._rate_limiter.acquire()
+                    response = self.client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=(filename, BytesIO(audio_data), content_type),
+                        response_format="verbose_json",
+                        # Only word granularity is consumed downstream
+                        timestamp_granularities=["word"],
                     )
+                    break
+                except Exception as e:
+                    if getattr(e, "status_code", None) == 429 and attempt < 4:
+                        time.sleep(backoff_delay(e, attempt))
+                        continue
+                    raise
+
+            payload = self._payload_from_response(response)
+            logger.info(
+                f"Transcribed chunk {chunk_index}: {len(payload['text'])} chars"
+            )
+            self._cache_put(cache_key, payload)
+            return self._result_from_payload(payload, chunk_index, start_time, end_time)
+
+        except Exception as e:
+            logger.error(f"Failed to transcribe chunk {chunk_index}: {str(e)}")
+            return self._empty_result(chunk_index, start_time, end_time, str(e))
+
+    async def transcribe_chunk_async(
+        self,
+        video_chunk_data: Optional[bytes],
+        chunk_index: int,
+        start_time: float,
+        end_time: float,
+        audio: Optional[Tuple[bytes, str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Async variant of transcribe_chunk for concurrent pipelines
 
-                    return result
+        Audio extraction (skipped when the caller passes `audio`) runs as an
+        asyncio subprocess and the Whisper upload goes through AsyncOpenAI,
+        so overlapping chunk transcriptions cost event-loop tasks instead of
+        worker threads.
+        """
+        try:
+            cache_key = self._transcript_cache_key(
+                audio[0] if audio is not None else video_chunk_data
+            )
+            cached = await asyncio.to_thread(self._cache_get, cache_key)
+            if cached is not None:
+                logger.info(f"Transcript cache hit for chunk {chunk_index}")
+                return self._result_from_payload(
+                    cached, chunk_index, start_time, end_time
+                )
+
+            if audio is not None:
+                audio_data, filename, content_type = audio
+            else:
+                audio_data, filename, content_type = (
+                    await self.extract_audio_from_video_async(video_chunk_data)
+                )
+
+            if not audio_data:
+                logger.warning(f"No audio extracted for chunk {chunk_index}")
+                return self._empty_result(chunk_index, start_time, end_time)
 
-                finally:
-                    if os.path.exists(audio_path):
-                        os.remove(audio_path)
+            for attempt in range(5):
+                try:
+                    await self._rate_limiter.acquire_async()
+                    response = await self.async_client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=(filename, BytesIO(audio_data), content_type),
+                        response_format="verbose_json",
+                        timestamp_granularities=["word"],
+                    )
+                    break
+                except Exception as e:
+                    if getattr(e, "status_code", None) == 429 and attempt < 4:
+                        await asyncio.sleep(backoff_delay(e, attempt))
+                        continue
+                    raise
+
+            payload = self._payload_from_response(response)
+            logger.info(
+                f"Transcribed chunk {chunk_index}: {len(payload['text'])} chars"
+            )
+            await asyncio.to_thread(self._cache_put, cache_key, payload)
+            return self._result_from_payload(payload, chunk_index, start_time, end_time)
 
         except Exception as e:
             logger.error(f"Failed to transcribe chunk {chunk_index}: {str(e)}")
-            return {
-                "text": "",
-                "chunk_index": chunk_index,
-                "start_time": start_time,
-                "end_time": end_time,
-                "error": str(e),
-            }
+            return self._empty_result(chunk_index, start_time, end_time, str(e))
 
     def transcribe_batch(
         self,
         chunks: list,
     ) -> list:
         """
-        Transcribe multiple video chunks
+        Transcribe multiple video chunks given as on-disk chunk files
         Returns list of transcription results in same order as chunks
+
+        Each chunk is seconds of network-bound Whisper latency, so the
+        chunks run on a bounded thread pool (WHISPER_CONCURRENCY, default 8)
+        instead of serially; executor.map preserves order
         """
-        transcriptions = []
 
-        for chunk_id, chunk_data, chunk_index, start_time, end_time in chunks:
-            transcription = self.transcribe_chunk(
+        def transcribe_one(chunk):
+            (
+                chunk_id,
+                chunk_path,
+                chunk_index,
+                start_time,
+                end_time,
+                _frames,
+                audio_path,
+            ) = chunk
+            # Prefer the audio segment from the split pass; only fall back
+            # to reading (and demuxing) the chunk mp4 when it's missing
+            if audio_path is not None:
+                with open(audio_path, "rb") as audio_file:
+                    audio = (audio_file.read(), "chunk.aac", "audio/aac")
+                return self.transcribe_chunk(
+                    video_chunk_data=None,
+                    chunk_index=chunk_index,
+                    start_time=start_time,
+                    end_time=end_time,
+                    audio=audio,
+                )
+            with open(chunk_path, "rb") as chunk_file:
+                chunk_data = chunk_file.read()
+            return self.transcribe_chunk(
                 video_chunk_data=chunk_data,
                 chunk_index=chunk_index,
                 start_time=start_time,
                 end_time=end_time,
             )
-            transcriptions.append(transcription)
 
-        return transcriptions
\ No newline at end of file
+        if not chunks:
+            return []
+
+        max_workers = min(len(chunks), int(os.environ.get("WHISPER_CONCURRENCY", 8)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(transcribe_one, chunks))
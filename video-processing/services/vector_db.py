@@ -1,24 +1,63 @@
 from pinecone import Pinecone
-import json
-from typing import List, Dict, Any
+import hashlib
+import orjson
+import time
+from collections import OrderedDict, defaultdict
+from typing import List, Dict, Any, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Query embedding cache bounds: repeat queries skip the embed round trip
+# for up to an hour, and the LRU cap keeps memory bounded
+_EMBED_CACHE_MAX = 10_000
+_EMBED_CACHE_TTL = 3600.0
+
 
 class VectorDBService:
     def __init__(self, api_key: str, index_host: str):
-        self.pc = Pinecone(api_key=api_key)
+        # pool_threads sizes the client's urllib3 pool so concurrent
+        # upsert/query batches reuse connections instead of handshaking
+        self.pc = Pinecone(api_key=api_key, pool_threads=16)
         # Connect directly to the existing index using host
         self.index = self.pc.Index(host=index_host)
+        self._embed_cache = OrderedDict()  # sha256(text) -> (vector, expires)
         logger.info(f"Connected to Pinecone index at {index_host}")
 
-    def upsert_video_chunk(self, chunk_id: str, user_id: str, video_id: str, text: str):
+    def _embed_query(self, query_text: str) -> List[float]:
+        """Embed a query, serving repeats from an in-process LRU+TTL cache
+
+        Query distributions are skewed, so the same text embeds over and
+        over; a hit turns the embed RTT into a dict lookup.
+        """
+        key = hashlib.sha256(query_text.encode("utf-8")).hexdigest()
+        cached = self._embed_cache.get(key)
+        if cached and time.monotonic() < cached[1]:
+            self._embed_cache.move_to_end(key)
+            return cached[0]
+
+        response = self.pc.inference.embed(
+            model="llama-text-embed-v2",
+            inputs=[{"text": query_text}],
+            parameters={"input_type": "query"},
+        )
+        vector = response.data[0].values
+
+        self._embed_cache[key] = (vector, time.monotonic() + _EMBED_CACHE_TTL)
+        self._embed_cache.move_to_end(key)
+        while len(self._embed_cache) > _EMBED_CACHE_MAX:
+            self._embed_cache.popitem(last=False)
+        return vector
+
+    def upsert_video_chunk(
+        self, chunk_id: str, user_id: str, video_id: str, text: str, chunk_index: int = 0
+    ):
         """Store video chunk with text embedding in Pinecone"""
         metadata = {
             "user_id": user_id,
             "video_id": video_id,
             "chunk_id": chunk_id,
+            "chunk_index": chunk_index,  # Lets storage keys be rebuilt without an S3 LIST
             "description": text  # Store the description text for retrieval
         }
 
@@ -28,7 +67,7 @@ class VectorDBService:
                     {
                         "id": chunk_id,
                         "text": text,  # Text will be embedded by Pinecone
-                        "metadata": json.dumps(metadata),
+                        "metadata": orjson.dumps(metadata).decode(),
                     }
                 ],
                 namespace=user_id,  # Use user_id as namespace
@@ -38,19 +77,55 @@ class VectorDBService:
             logger.error(f"Failed to upsert chunk {chunk_id}: {str(e)}")
             raise
 
+    def upsert_video_chunks_batch(
+        self,
+        rows: List[Tuple[str, str, str, str, int]],
+        batch_size: int = 100,
+    ):
+        """Store many video chunks in batched upserts instead of one call each
+
+        rows is a list of (chunk_id, user_id, video_id, text, chunk_index).
+        Per-request latency dominates small upserts, so grouping records into
+        batches of up to batch_size per namespace replaces N round trips with
+        ceil(N/100).
+        """
+        rows_by_namespace = defaultdict(list)
+        for chunk_id, user_id, video_id, text, chunk_index in rows:
+            metadata = {
+                "user_id": user_id,
+                "video_id": video_id,
+                "chunk_id": chunk_id,
+                "chunk_index": chunk_index,
+                "description": text,
+            }
+            rows_by_namespace[user_id].append(
+                {
+                    "id": chunk_id,
+                    "text": text,  # Text will be embedded by Pinecone
+                    "metadata": orjson.dumps(metadata).decode(),
+                }
+            )
+
+        try:
+            for namespace, records in rows_by_namespace.items():
+                for start in range(0, len(records), batch_size):
+                    self.index.upsert_records(
+                        records=records[start:start + batch_size],
+                        namespace=namespace,
+                    )
+                logger.info(f"Upserted {len(records)} chunks to namespace {namespace}")
+        except Exception as e:
+            logger.error(f"Failed to batch upsert chunks: {str(e)}")
+            raise
+
     def query_clips(
         self, query_text: str, user_id: str, top_k: int = 10
     ) -> List[Dict[str, Any]]:
         """Query for relevant video clips"""
         try:
-            embed_response = self.pc.inference.embed(
-                model="llama-text-embed-v2",
-                inputs=[{"text": query_text}],
-                parameters={"input_type": "query"},
-            )
-            vector = embed_response.data[0].values
+            vector = self._embed_query(query_text)
             results = self.index.query(
-                vector=vector,  # Text will be embedded by Pinecone
+                vector=vector,
                 top_k=top_k,
                 namespace=user_id,  # Use user_id as namespace
                 include_metadata=True,
@@ -58,13 +133,14 @@ class VectorDBService:
 
             clips = []
             for match in results.matches:
-                metadata = json.loads(match.metadata.get("metadata"))
+                metadata = orjson.loads(match.metadata.get("metadata"))
                 clips.append(
                     {
                         "chunk_id": match.id,
                         "score": match.score,
                         "user_id": metadata.get("user_id"),
                         "video_id": metadata.get("video_id"),
+                        "chunk_index": metadata.get("chunk_index"),
                     }
                 )
 
@@ -79,12 +155,7 @@ class VectorDBService:
     ) -> List[Dict[str, Any]]:
         """Query for relevant video clips with their descriptions"""
         try:
-            embed_response = self.pc.inference.embed(
-                model="llama-text-embed-v2",
-                inputs=[{"text": query_text}],
-                parameters={"input_type": "query"},
-            )
-            vector = embed_response.data[0].values
+            vector = self._embed_query(query_text)
             results = self.index.query(
                 vector=vector,
                 top_k=top_k,
@@ -94,13 +165,14 @@ class VectorDBService:
 
             clips = []
             for match in results.matches:
-                metadata = json.loads(match.metadata.get("metadata"))
+                metadata = orjson.loads(match.metadata.get("metadata"))
                 clips.append(
                     {
                         "chunk_id": match.id,
                         "score": match.score,
                         "user_id": metadata.get("user_id"),
                         "video_id": metadata.get("video_id"),
+                        "chunk_index": metadata.get("chunk_index"),
                         "description": metadata.get("description", "No description available"),
                     }
                 )
@@ -129,25 +201,19 @@ class VectorDBService:
             raise
 
     def delete_video_chunks(self, user_id: str, video_id: str):
-        """Delete all chunks for a given video from Pinecone"""
+        """Delete all chunks for a given video from Pinecone
+
+        Deletes by server-side metadata filter — one call, no ANN search.
+        The old path ran a top_k=10000 vector query just to enumerate IDs.
+        """
         try:
-            # Query with a generic text to find all chunks for this video
-            results = self.index.query(
-                vector="video chunk",  # Generic query text
-                top_k=10000,
-                namespace=user_id,  # Use user_id as namespace
+            self.index.delete(
                 filter={"video_id": video_id},
+                namespace=user_id,  # Use user_id as namespace
+            )
+            logger.info(
+                f"Deleted chunks for video {video_id} from namespace {user_id}"
             )
-
-            chunk_ids = [match.id for match in results.matches]
-
-            if chunk_ids:
-                self.index.delete(
-                    ids=chunk_ids,
-                    namespace=user_id,  # Use user_id as namespace
-                )
-                logger.info(f"Deleted {len(chunk_ids)} chunks from namespace {user_id}")
-
         except Exception as e:
             logger.error(f"Failed to delete video chunks from Pinecone: {str(e)}")
             raise
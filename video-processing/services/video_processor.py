@@ -1,120 +1,348 @@
+import glob
+import json
 import tempfile
 import os
 import subprocess
 import logging
-from typing import List, Tuple, BinaryIO
+from typing import Any, Dict, Iterator, List, Optional, Tuple, BinaryIO
 import uuid
 from utils.constants import CHUNK_DURATION_SECONDS, TEMP_DIR, VIDEO_CHUNK_FORMAT
+from utils.ffmpeg import detect_hwaccel_args
 
 logger = logging.getLogger(__name__)
 
+# Seconds between the downscaled sample frames emitted for the VLM during
+# the split pass
+_FRAME_SAMPLE_SECONDS = 5
+
+# Fixed argv shapes, hoisted so each invocation only splices in its variable
+# fields (paths, timestamps) instead of rebuilding the whole list
+_PROBE_ARGS = (
+    "ffprobe",
+    "-v",
+    "error",
+    "-analyzeduration",
+    "1M",
+    "-probesize",
+    "1M",
+    "-show_entries",
+    "stream=codec_type,codec_name,r_frame_rate:format=duration",
+    "-of",
+    "json",
+)
+_KEYFRAME_PROBE_ARGS = (
+    "ffprobe",
+    "-v",
+    "error",
+    "-select_streams",
+    "v:0",
+    "-show_entries",
+    "packet=pts_time,flags",
+    "-of",
+    "csv=p=0",
+)
+_THUMBNAIL_OUT_ARGS = (
+    "-vframes",
+    "1",
+    "-q:v",
+    "2",
+    "-f",
+    "image2pipe",
+    "-vcodec",
+    "mjpeg",
+    "pipe:1",
+)
+
 
 class VideoProcessor:
     def __init__(self):
         self.chunk_duration = CHUNK_DURATION_SECONDS
+        self.hwaccel_args = list(detect_hwaccel_args())
+        self._probe_cache = {}  # {"key": (path, mtime), "info": {...}}
+        # Per-instance argv templates that depend on chunk_duration, built
+        # once here rather than per split
+        self._segment_out_args = (
+            "-f",
+            "segment",
+            "-segment_time",
+            str(self.chunk_duration),
+            "-reset_timestamps",
+            "1",
+            # Put each chunk's moov atom up front so downstream consumers can
+            # demux the mp4 from a pipe without seeking
+            "-segment_format_options",
+            "movflags=+faststart",
+        )
+        self._reencode_args = (
+            "-c:v",
+            "libx264",
+            "-c:a",
+            "aac",
+            "-preset",
+            "fast",
+            # Force a keyframe on every chunk boundary so the segment muxer
+            # cuts exactly at chunk_duration
+            "-force_key_frames",
+            f"expr:gte(t,n_forced*{self.chunk_duration})",
+        )
+        self._frame_out_args = (
+            "-map",
+            "0:v:0",
+            "-vf",
+            f"fps=1/{_FRAME_SAMPLE_SECONDS},scale=512:-1",
+            # q=5 is visually fine for VLM input at this size and roughly
+            # halves the bytes that later get base64'd into the request
+            "-q:v",
+            "5",
+            "-f",
+            "image2",
+        )
+
+    def probe(self, video_path: str) -> Dict[str, Any]:
+        """Probe stream layout, codecs, frame rate and duration in one ffprobe
+
+        Memoized per (path, mtime), so validating and then splitting the
+        same upload costs one fork between them instead of one per lookup.
+        The probe caps keep ffprobe on the container headers and the first
+        ~1 MB of packets regardless of upload size.
+        """
+        cache_key = (video_path, os.path.getmtime(video_path))
+        if self._probe_cache.get("key") == cache_key:
+            return self._probe_cache["info"]
+
+        cmd = [*_PROBE_ARGS, video_path]
+        result = subprocess.run(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        data = json.loads(result.stdout)
+        streams = data.get("streams") or []
+        video_stream = next(
+            (s for s in streams if s.get("codec_type") == "video"), {}
+        )
+        audio_stream = next(
+            (s for s in streams if s.get("codec_type") == "audio"), None
+        )
+        info = {
+            "has_video": bool(video_stream),
+            "r_frame_rate": video_stream.get("r_frame_rate"),
+            "audio_codec": audio_stream.get("codec_name") if audio_stream else None,
+            "duration": float(data.get("format", {}).get("duration", 0.0)),
+        }
+        self._probe_cache = {"key": cache_key, "info": info}
+        return info
 
     def get_video_duration(self, video_path: str) -> float:
         """Get the duration of a video file in seconds"""
         try:
-            cmd = [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                video_path,
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            duration = float(result.stdout.strip())
+            duration = self.probe(video_path)["duration"]
             logger.info(f"Video duration: {duration} seconds")
             return duration
         except Exception as e:
             logger.error(f"Failed to get video duration: {str(e)}")
             raise
 
+    def _probe_keyframes(self, video_path: str) -> List[float]:
+        """Return the keyframe timestamps of the video's first video stream"""
+        try:
+            cmd = [*_KEYFRAME_PROBE_ARGS, video_path]
+            result = subprocess.run(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+
+            keyframes = []
+            for line in result.stdout.splitlines():
+                parts = line.split(",")
+                if len(parts) >= 2 and "K" in parts[1]:
+                    try:
+                        keyframes.append(float(parts[0]))
+                    except ValueError:
+                        continue
+            keyframes.sort()
+            return keyframes
+        except Exception as e:
+            logger.warning(f"Failed to probe keyframes: {str(e)}")
+            return []
+
     def split_video(
-        self, video_data: bytes, video_id: str
-    ) -> List[Tuple[str, bytes, int, float, float]]:
+        self, video_path: str, video_id: str
+    ) -> Iterator[Tuple[str, str, int, float, float, List[str], Optional[str]]]:
         """
-        Split video into chunks of specified duration
-        Returns list of (chunk_id, chunk_data, chunk_index, start_time, end_time)
+        Split a video file on disk into chunks of specified duration
+        Yields (chunk_id, chunk_path, chunk_index, start_time, end_time,
+        frame_paths, audio_path); the caller owns the chunk, frame and audio
+        files and removes them
+
+        One ffmpeg segment-muxer invocation produces every chunk: a single
+        demux pass instead of one process (and one input parse) per chunk.
+        Sources with keyframes at least chunk_duration apart stream-copy —
+        no decode/encode at all — while keyframe-sparse sources fall back to
+        one libx264 re-encode with keyframes forced on chunk boundaries.
+
+        The same invocation's second output emits downscaled JPEG sample
+        frames for the VLM, and a third segments the audio track into
+        per-chunk ADTS files for Whisper, so no later pass ever re-spawns
+        ffmpeg against the chunk mp4s.
         """
-        chunks = []
+        info = self.probe(video_path)
+        duration = info["duration"]
 
-        with tempfile.NamedTemporaryFile(
-            suffix=".mp4", dir=TEMP_DIR, delete=False
-        ) as input_file:
-            input_file.write(video_data)
-            input_file.flush()
-            input_path = input_file.name
+        # A keyframe interval longer than a chunk means copy-segmented chunks
+        # would drift far from their nominal times; re-encode instead. The
+        # stretch after the last keyframe counts as an interval too — a
+        # single keyframe at t=0 on a long video is the sparsest case of all
+        keyframes = self._probe_keyframes(video_path)
+        intervals = [b - a for a, b in zip(keyframes, keyframes[1:])]
+        if keyframes:
+            intervals.append(duration - keyframes[-1])
+        stream_copy = bool(keyframes) and not (
+            intervals and max(intervals) > self.chunk_duration
+        )
 
-            try:
-                duration = self.get_video_duration(input_path)
-                num_chunks = int(duration / self.chunk_duration) + (
-                    1 if duration % self.chunk_duration > 0 else 0
-                )
+        chunk_pattern = os.path.join(
+            TEMP_DIR, f"{video_id}_%05d.{VIDEO_CHUNK_FORMAT}"
+        )
+        frame_pattern = os.path.join(TEMP_DIR, f"{video_id}_frame_%05d.jpg")
+        audio_pattern = os.path.join(TEMP_DIR, f"{video_id}_audio_%05d.aac")
 
-                logger.info(
-                    f"Splitting video into {num_chunks} chunks of {self.chunk_duration} seconds"
-                )
+        if stream_copy:
+            codec_args = ("-c", "copy")
+        else:
+            logger.info("Keyframes too sparse for stream copy; re-encoding chunks")
+            codec_args = self._reencode_args
 
-                for i in range(num_chunks):
-                    chunk_id = str(uuid.uuid4())
-                    start_time = i * self.chunk_duration
-                    end_time = min((i + 1) * self.chunk_duration, duration)
-                    actual_duration = end_time - start_time
+        def build_cmd(hwaccel_args):
+            cmd = [
+                "ffmpeg",
+                "-y",
+                *hwaccel_args,
+                "-i",
+                video_path,
+                # Only the primary video and (if present) audio streams: data
+                # and timecode tracks (QuickTime mebx/tmcd) have no mp4 tag
+                # and would fail the segment muxer outright
+                "-map",
+                "0:v:0",
+                "-map",
+                "0:a:0?",
+                *codec_args,
+                *self._segment_out_args,
+                chunk_pattern,
+                # Second output: one downscaled JPEG every
+                # _FRAME_SAMPLE_SECONDS for the VLM, from the same decode pass
+                *self._frame_out_args,
+                frame_pattern,
+            ]
+            if info["audio_codec"] is not None:
+                # Third output: the audio track segmented into per-chunk ADTS
+                # files for Whisper; AAC sources stream-copy, everything else
+                # encodes once here instead of once per chunk later
+                cmd += [
+                    "-map",
+                    "0:a:0",
+                    "-c:a",
+                    "copy" if info["audio_codec"] == "aac" else "aac",
+                    "-f",
+                    "segment",
+                    "-segment_time",
+                    str(self.chunk_duration),
+                    "-reset_timestamps",
+                    "1",
+                    "-segment_format",
+                    "adts",
+                    audio_pattern,
+                ]
+            return cmd
 
-                    output_path = os.path.join(
-                        TEMP_DIR, f"{chunk_id}.{VIDEO_CHUNK_FORMAT}"
-                    )
+        def cleanup_outputs():
+            for stale in glob.glob(os.path.join(TEMP_DIR, f"{video_id}_*")):
+                if os.path.exists(stale):
+                    os.remove(stale)
 
-                    try:
-                        cmd = [
-                            "ffmpeg",
-                            "-i",
-                            input_path,
-                            "-ss",
-                            str(start_time),
-                            "-t",
-                            str(actual_duration),
-                            "-c:v",
-                            "libx264",
-                            "-c:a",
-                            "aac",
-                            "-preset",
-                            "fast",
-                            "-movflags",
-                            "+faststart",
-                            "-y",
-                            output_path,
-                        ]
-
-                        subprocess.run(cmd, capture_output=True, check=True)
-
-                        with open(output_path, "rb") as chunk_file:
-                            chunk_data = chunk_file.read()
-
-                        chunks.append((chunk_id, chunk_data, i, start_time, end_time))
-                        logger.info(f"Created chunk {i + 1}/{num_chunks}: {chunk_id}")
-
-                    except subprocess.CalledProcessError as e:
-                        logger.error(f"Failed to create chunk {i}: {e.stderr.decode()}")
-                        raise
-                    finally:
-                        if os.path.exists(output_path):
-                            os.remove(output_path)
-
-            finally:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
-
-        logger.info(f"Successfully split video into {len(chunks)} chunks")
-        return chunks
+        def run_split(cmd):
+            # ffmpeg writes nothing useful to stdout here and must not wait
+            # on a tty; stderr stays piped for the failure log
+            subprocess.run(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=True,
+            )
+
+        try:
+            run_split(build_cmd(self.hwaccel_args))
+        except subprocess.CalledProcessError as e:
+            cleanup_outputs()
+            if not self.hwaccel_args:
+                logger.error(f"Failed to segment video: {e.stderr.decode()}")
+                raise
+            # Hardware decode can fail on codecs NVDEC doesn't cover; drop
+            # back to software for this instance and retry once
+            logger.warning(
+                "Segmenting failed with hwaccel; falling back to software "
+                f"decode: {e.stderr.decode()}"
+            )
+            self.hwaccel_args = []
+            try:
+                run_split(build_cmd(self.hwaccel_args))
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Failed to segment video: {e.stderr.decode()}")
+                cleanup_outputs()
+                raise
+
+        chunk_paths = sorted(
+            glob.glob(
+                os.path.join(TEMP_DIR, f"{video_id}_[0-9]*.{VIDEO_CHUNK_FORMAT}")
+            )
+        )
+        all_frame_paths = sorted(
+            glob.glob(os.path.join(TEMP_DIR, f"{video_id}_frame_*.jpg"))
+        )
+        audio_paths = sorted(
+            glob.glob(os.path.join(TEMP_DIR, f"{video_id}_audio_*.aac"))
+        )
+        num_chunks = len(chunk_paths)
+        logger.info(
+            f"Split video into {num_chunks} chunks of ~{self.chunk_duration} seconds "
+            f"({'stream copy' if stream_copy else 're-encode'}, "
+            f"{len(all_frame_paths)} sample frames)"
+        )
+
+        for i, chunk_path in enumerate(chunk_paths):
+            chunk_id = str(uuid.uuid4())
+            start_time = i * self.chunk_duration
+            end_time = duration if i + 1 == num_chunks else (i + 1) * self.chunk_duration
+
+            # Sample frame j was taken at ~j * _FRAME_SAMPLE_SECONDS; hand
+            # each chunk the frames that fall inside its time range
+            frame_paths = [
+                fp
+                for j, fp in enumerate(all_frame_paths)
+                if start_time <= j * _FRAME_SAMPLE_SECONDS < end_time
+            ]
+            # Audio segments share the video's segment_time, so index i's
+            # audio file covers chunk i; sources with no (or shorter) audio
+            # yield None and the caller falls back to extracting from the mp4
+            audio_path = audio_paths[i] if i < len(audio_paths) else None
+            yield (
+                chunk_id, chunk_path, i, start_time, end_time, frame_paths,
+                audio_path,
+            )
 
     def extract_thumbnail(self, video_data: bytes, timestamp: float = 0) -> bytes:
-        """Extract a thumbnail from a video at the specified timestamp"""
+        """Extract a thumbnail from a video at the specified timestamp
+
+        The input stays on disk (seeking needs a seekable source) but the
+        JPEG comes back over stdout, so no output file is written
+        """
         with tempfile.NamedTemporaryFile(
             suffix=".mp4", dir=TEMP_DIR, delete=False
         ) as input_file:
@@ -122,68 +350,41 @@ class VideoProcessor:
             input_file.flush()
             input_path = input_file.name
 
-            thumbnail_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}.jpg")
-
-            try:
-                cmd = [
-                    "ffmpeg",
-                    "-i",
-                    input_path,
-                    "-ss",
-                    str(timestamp),
-                    "-vframes",
-                    "1",
-                    "-q:v",
-                    "2",
-                    "-y",
-                    thumbnail_path,
-                ]
-
-                subprocess.run(cmd, capture_output=True, check=True)
+        try:
+            cmd = [
+                "ffmpeg",
+                "-ss",
+                str(timestamp),
+                "-i",
+                input_path,
+                *_THUMBNAIL_OUT_ARGS,
+            ]
 
-                with open(thumbnail_path, "rb") as thumb_file:
-                    thumbnail_data = thumb_file.read()
+            result = subprocess.run(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                check=True,
+            )
+            return result.stdout
 
-                return thumbnail_data
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Failed to extract thumbnail: {e.stderr.decode()}")
+            raise
+        finally:
+            if os.path.exists(input_path):
+                os.remove(input_path)
 
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Failed to extract thumbnail: {e.stderr.decode()}")
-                raise
-            finally:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
-                if os.path.exists(thumbnail_path):
-                    os.remove(thumbnail_path)
-
-    def validate_video(self, video_data: bytes) -> bool:
-        """Validate that the uploaded file is a valid video"""
-        with tempfile.NamedTemporaryFile(
-            suffix=".mp4", dir=TEMP_DIR, delete=False
-        ) as temp_file:
-            temp_file.write(video_data)
-            temp_file.flush()
-            temp_path = temp_file.name
+    def validate_video(self, video_path: str) -> bool:
+        """Validate that the uploaded file on disk is a valid video
 
-            try:
-                cmd = [
-                    "ffprobe",
-                    "-v",
-                    "error",
-                    "-select_streams",
-                    "v:0",
-                    "-show_entries",
-                    "stream=codec_type",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    temp_path,
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                is_valid = result.stdout.strip() == "video"
-                logger.info(f"Video validation: {'valid' if is_valid else 'invalid'}")
-                return is_valid
-            except Exception as e:
-                logger.error(f"Failed to validate video: {str(e)}")
-                return False
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+        Shares the memoized probe with get_video_duration, so validation
+        followed by splitting forks ffprobe once.
+        """
+        try:
+            is_valid = self.probe(video_path)["has_video"]
+            logger.info(f"Video validation: {'valid' if is_valid else 'invalid'}")
+            return is_valid
+        except Exception as e:
+            logger.error(f"Failed to validate video: {str(e)}")
+            return False
@@ -1,107 +1,339 @@
 import anthropic
-import base64
-import tempfile
+import asyncio
+import binascii
+import hashlib
 import os
 import subprocess
 import logging
+import time
+from collections import deque
 from typing import List, Tuple, Optional, Dict, Any
-import uuid
-from utils.constants import TEMP_DIR, SLIDING_WINDOW_SECONDS, CHUNK_DURATION_SECONDS
+from utils.constants import SLIDING_WINDOW_SECONDS, CHUNK_DURATION_SECONDS
+from utils.ffmpeg import detect_hwaccel_args
+from utils.rate_limit import TokenBucket, backoff_delay
 
 logger = logging.getLogger(__name__)
 
+# Fixed argv shape for the keyframe pipeline; the command no longer varies
+# per call beyond the hwaccel prefix
+_KEYFRAME_OUT_ARGS = (
+    "-vsync",
+    "0",
+    "-q:v",
+    "5",
+    "-f",
+    "image2pipe",
+    "-vcodec",
+    "mjpeg",
+    "pipe:1",
+)
+# Model identifier, also folded into description cache keys so a model
+# bump invalidates cached output
+_MODEL = "claude-3-haiku-20240307"
+
+# Invariant instruction block appended to every chunk prompt; built once
+# here instead of re-concatenated per call
+_PROMPT_TAIL = """Provide a comprehensive description that includes:
+                1. Main subjects and activities
+                2. Scene setting and environment
+                3. Notable objects or text visible
+                4. Any dialogue or speech content (integrate naturally with visual description)
+                5. How audio content relates to visual content
+                6. Any significant changes between frames
+                7. Overall context and mood
+                8. How this segment relates to or continues from previous segments (if applicable)
+
+                Format your response as a single, searchable paragraph optimized for semantic search.
+                Focus on concrete, observable details and spoken content that would help someone find this segment."""
+
 
 class VLMService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, description_cache=None):
         self.client = anthropic.Anthropic(api_key=api_key)
+        self.async_client = anthropic.AsyncAnthropic(api_key=api_key)
         self.sliding_window_chunks = int(
             SLIDING_WINDOW_SECONDS / CHUNK_DURATION_SECONDS
         )
+        # Optional dict-like cache (e.g. a modal.Dict) mapping content hashes
+        # to generated descriptions; re-uploads of identical content skip the
+        # LLM round trip entirely
+        self.description_cache = description_cache
+        # Shared across concurrent chunk descriptions; keeps request
+        # throughput under the Anthropic RPM ceiling instead of bursting
+        # into 429s
+        self._rate_limiter = TokenBucket(
+            float(os.environ.get("ANTHROPIC_RPM", 1000))
+        )
+        # Second bucket for the TPM ceiling: each request reserves its
+        # estimated token cost up front, so bursts of image-heavy prompts
+        # slow down before the provider starts rejecting them
+        self._token_limiter = TokenBucket(
+            float(os.environ.get("ANTHROPIC_TPM", 100_000))
+        )
+        # Bound concurrent ffmpeg decodes to the vCPU count so a burst of
+        # chunks saturates the cores without oversubscribing them
+        self._ffmpeg_semaphore = asyncio.Semaphore(os.cpu_count() or 4)
+        # Instance copy so a decode failure can drop back to software
+        # without affecting other services sharing the probe result
+        self._hwaccel_args = list(detect_hwaccel_args())
         logger.info(
             f"Initialized VLM service with Anthropic API (sliding window: {self.sliding_window_chunks} chunks)"
         )
 
+    @staticmethod
+    def _description_cache_key(keyframes: List[bytes], prompt_text: str) -> str:
+        """Content hash over the keyframes and the full prompt text
+
+        Including the prompt keeps context-sensitive descriptions correct:
+        the same frames with different transcription or sliding-window
+        context hash to different keys.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(_MODEL.encode("ascii"))
+        h.update(prompt_text.encode("utf-8"))
+        for frame in keyframes:
+            h.update(frame)
+        return h.hexdigest()
+
+    def _cache_get(self, cache_key: str) -> Optional[str]:
+        try:
+            return self.description_cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Description cache lookup failed: {str(e)}")
+            return None
+
+    def _cache_put(self, cache_key: str, description: str) -> None:
+        try:
+            self.description_cache[cache_key] = description
+        except Exception as e:
+            logger.warning(f"Description cache store failed: {str(e)}")
+
     def extract_keyframes(
         self, video_data: bytes, timestamps: List[float] = None
     ) -> List[bytes]:
         """
         Extract keyframes from video chunk at specified timestamps
         If no timestamps provided, extracts at 25%, 50%, 75% of duration
+
+        A single ffmpeg invocation with -skip_frame nokey decodes only the
+        chunk's I-frames — no seeking, no inter-frame decode — then the
+        frames nearest the requested positions are picked from the result.
+        The chunk goes in over stdin and the frames come back over stdout
+        as concatenated JPEGs, so no temp file is written on either side
+        (chunks are muxed with faststart, which keeps their mp4s demuxable
+        from a pipe).
         """
         if timestamps is None:
             timestamps = [0.25, 0.5, 0.75]
 
-        frames = []
-
-        with tempfile.NamedTemporaryFile(
-            suffix=".mp4", dir=TEMP_DIR, delete=False
-        ) as input_file:
-            input_file.write(video_data)
-            input_file.flush()
-            input_path = input_file.name
-
-            try:
-                duration = self._get_video_duration(input_path)
-
-                for timestamp_ratio in timestamps:
-                    timestamp = duration * timestamp_ratio
-                    frame_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}.jpg")
-
-                    try:
-                        cmd = [
-                            "ffmpeg",
-                            "-i",
-                            input_path,
-                            "-ss",
-                            str(timestamp),
-                            "-vframes",
-                            "1",
-                            "-q:v",
-                            "2",
-                            "-y",
-                            frame_path,
-                        ]
-
-                        subprocess.run(cmd, capture_output=True, check=True)
-
-                        with open(frame_path, "rb") as frame_file:
-                            frame_data = frame_file.read()
-                            frames.append(frame_data)
-
-                        logger.info(f"Extracted keyframe at {timestamp:.2f}s")
-
-                    except subprocess.CalledProcessError as e:
-                        logger.error(
-                            f"Failed to extract keyframe at {timestamp}: {e.stderr.decode()}"
-                        )
-                    finally:
-                        if os.path.exists(frame_path):
-                            os.remove(frame_path)
-
-            finally:
-                if os.path.exists(input_path):
-                    os.remove(input_path)
+        cmd = self._keyframe_cmd()
+        result = subprocess.run(cmd, input=video_data, capture_output=True)
+        if result.returncode != 0 and self._hwaccel_args:
+            # Hardware decode can fail on codecs NVDEC doesn't cover; drop
+            # back to software for this instance and retry once
+            logger.warning(
+                "Keyframe extraction failed with hwaccel; falling back to "
+                f"software decode: {result.stderr.decode()}"
+            )
+            self._hwaccel_args = []
+            cmd = self._keyframe_cmd()
+            result = subprocess.run(cmd, input=video_data, capture_output=True)
+        if result.returncode != 0:
+            logger.error(
+                f"Failed to extract keyframes: {result.stderr.decode()}"
+            )
+            return []
 
+        frames = self._pick_frames(
+            self._frames_from_mjpeg(result.stdout), timestamps
+        )
+        logger.info(f"Extracted {len(frames)} keyframes in one pass")
         return frames
 
-    def _get_video_duration(self, video_path: str) -> float:
-        """Get video duration in seconds"""
-        try:
-            cmd = [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                video_path,
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return float(result.stdout.strip())
-        except Exception as e:
-            logger.error(f"Failed to get video duration: {str(e)}")
-            return 10.0
+    async def extract_keyframes_async(
+        self, video_data: bytes, timestamps: List[float] = None
+    ) -> List[bytes]:
+        """Async variant of extract_keyframes
+
+        The decode runs as an asyncio subprocess under a cpu-count
+        semaphore, so concurrent chunks keep the cores busy without
+        oversubscribing them while the event loop stays free for API calls.
+        """
+        if timestamps is None:
+            timestamps = [0.25, 0.5, 0.75]
+
+        cmd = self._keyframe_cmd()
+        async with self._ffmpeg_semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await process.communicate(video_data)
+
+            if process.returncode != 0 and self._hwaccel_args:
+                # Hardware decode can fail on codecs NVDEC doesn't cover;
+                # drop back to software for this instance and retry once
+                logger.warning(
+                    "Keyframe extraction failed with hwaccel; falling back "
+                    f"to software decode: {stderr.decode()}"
+                )
+                self._hwaccel_args = []
+                cmd = self._keyframe_cmd()
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                stdout, stderr = await process.communicate(video_data)
+
+        if process.returncode != 0:
+            logger.error(f"Failed to extract keyframes: {stderr.decode()}")
+            return []
+
+        frames = self._pick_frames(self._frames_from_mjpeg(stdout), timestamps)
+        logger.info(f"Extracted {len(frames)} keyframes in one pass")
+        return frames
+
+    def _keyframe_cmd(self) -> List[str]:
+        """Build the I-frame dump command for a chunk
+
+        -skip_frame nokey makes the decoder drop everything but I-frames
+        before any pixel work happens, so the pass costs one demux plus a
+        handful of intra decodes regardless of chunk length — and needs no
+        up-front duration/fps probe. Downscales to 768px wide before
+        encoding: Claude's vision path doesn't resolve more than that, and
+        full-resolution q=2 JPEGs were megabytes of base64 per frame in
+        the request payload.
+        """
+        return [
+            "ffmpeg",
+            *self._hwaccel_args,
+            "-skip_frame",
+            "nokey",
+            "-i",
+            "pipe:0",
+            "-vf",
+            "scale=min(768\\,iw):-2",
+            *_KEYFRAME_OUT_ARGS,
+        ]
+
+    @staticmethod
+    def _pick_frames(
+        frames: List[bytes], timestamps: List[float]
+    ) -> List[bytes]:
+        """Pick the decoded I-frames nearest the requested positions
+
+        I-frames land at a fixed GOP cadence, so the frame at index
+        ratio*(n-1) sits closest to ratio of the chunk's duration. Chunks
+        short on keyframes just return everything they have.
+        """
+        if len(frames) <= len(timestamps):
+            return frames
+        indices = sorted(
+            {round(ratio * (len(frames) - 1)) for ratio in timestamps}
+        )
+        return [frames[i] for i in indices]
+
+    @staticmethod
+    def _frames_from_mjpeg(stream: bytes) -> List[bytes]:
+        """Split a concatenated MJPEG stdout stream into JPEG frames
+
+        Splits on the JPEG SOI marker, which can't occur inside
+        entropy-coded data (0xFF bytes there are always stuffed with 0x00).
+        """
+        return [
+            b"\xff\xd8" + part
+            for part in stream.split(b"\xff\xd8")
+            if part
+        ]
+
+    def _build_prompt_text(
+        self,
+        chunk_index: int,
+        start_time: float,
+        end_time: float,
+        video_filename: str,
+        previous_descriptions: Optional[List[Tuple[int, float, float, str]]],
+        current_transcription: Optional[str],
+        previous_transcription: Optional[str],
+    ) -> str:
+        """Build the text part of the Claude prompt
+
+        Kept separate from image encoding so the cache key can be computed
+        (and a hit returned) before any frame is base64-expanded. The
+        variable parts accumulate in a list joined once at the end; the
+        invariant instruction block is the module constant _PROMPT_TAIL.
+        """
+        # Build prompt with context from previous descriptions if available
+        parts = [
+            f"""Analyze these keyframes from a video segment (chunk {chunk_index},
+                time {start_time:.1f}s to {end_time:.1f}s from file '{video_filename}').
+        """
+        ]
+
+        # Add audio transcription context
+        if current_transcription:
+            parts.append(f"\n\nAudio transcription for this segment:\n\"{current_transcription}\"")
+
+        if previous_transcription:
+            parts.append(f"\n\nAudio from previous segment:\n\"{previous_transcription}\"")
+
+        # Add context from previous descriptions
+        if previous_descriptions:
+            parts.append("\n\nContext from previous segments:\n")
+            for prev_idx, prev_start, prev_end, prev_desc in previous_descriptions:
+                parts.append(f"\n- Segment {prev_idx} ({prev_start:.1f}s-{prev_end:.1f}s): {prev_desc}")
+            parts.append(
+                "\n\nBased on the audio, context above and the current keyframes, "
+            )
+        else:
+            parts.append("\n\n")
+
+        parts.append(_PROMPT_TAIL)
+
+        return "".join(parts)
+
+    @staticmethod
+    def _build_message_content(
+        prompt_text: str, keyframes: List[bytes]
+    ) -> List[Dict[str, Any]]:
+        """Assemble the Claude message content (prompt text + keyframe images)
+
+        This is where each frame pays its 4/3x base64 expansion, so it only
+        runs after the description cache has missed.
+        """
+        content = [
+            {
+                "type": "text",
+                "text": prompt_text,
+            }
+        ]
+        content.extend(
+            {
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/jpeg",
+                    "data": binascii.b2a_base64(frame_data, newline=False).decode("ascii"),
+                },
+            }
+            for frame_data in keyframes
+        )
+
+        return content
+
+    @staticmethod
+    def _estimate_tokens(prompt_text: str, keyframes: List[bytes]) -> float:
+        """Rough request token cost for the TPM bucket
+
+        ~4 chars per text token; a downscaled 768px frame lands around
+        1200 image tokens. Slight overestimates are fine — the bucket
+        refills continuously.
+        """
+        return len(prompt_text) / 4 + len(keyframes) * 1200
 
     def generate_description(
         self,
@@ -113,85 +345,154 @@ class VLMService:
         previous_descriptions: Optional[List[Tuple[int, float, float, str]]] = None,
         current_transcription: Optional[str] = None,
         previous_transcription: Optional[str] = None,
+        keyframes: Optional[List[bytes]] = None,
     ) -> str:
         """
         Generate natural language description of video chunk using Claude Vision
         Enhanced with audio transcription context
+
+        Callers that already hold sample frames (e.g. from the split pass)
+        can pass them as `keyframes` to skip re-decoding the chunk here
         """
         try:
-            keyframes = self.extract_keyframes(video_chunk_data)
+            if keyframes is None:
+                keyframes = self.extract_keyframes(video_chunk_data)
 
             if not keyframes:
                 logger.warning(f"No keyframes extracted for chunk {chunk_index}")
                 return f"Video segment {chunk_index} from {start_time:.1f}s to {end_time:.1f}s"
 
-            # Build prompt with context from previous descriptions if available
-            prompt_text = f"""Analyze these keyframes from a video segment (chunk {chunk_index},
-                    time {start_time:.1f}s to {end_time:.1f}s from file '{video_filename}').
-            """
-
-            # Add audio transcription context
-            if current_transcription:
-                prompt_text += f"\n\nAudio transcription for this segment:\n\"{current_transcription}\""
-
-            if previous_transcription:
-                prompt_text += f"\n\nAudio from previous segment:\n\"{previous_transcription}\""
-
-            # Add context from previous descriptions
-            if previous_descriptions:
-                prompt_text += "\n\nContext from previous segments:\n"
-                for prev_idx, prev_start, prev_end, prev_desc in previous_descriptions:
-                    prompt_text += f"\n- Segment {prev_idx} ({prev_start:.1f}s-{prev_end:.1f}s): {prev_desc}"
-                prompt_text += (
-                    "\n\nBased on the audio, context above and the current keyframes, "
-                )
-            else:
-                prompt_text += "\n\n"
-
-            prompt_text += """Provide a comprehensive description that includes:
-                    1. Main subjects and activities
-                    2. Scene setting and environment
-                    3. Notable objects or text visible
-                    4. Any dialogue or speech content (integrate naturally with visual description)
-                    5. How audio content relates to visual content
-                    6. Any significant changes between frames
-                    7. Overall context and mood
-                    8. How this segment relates to or continues from previous segments (if applicable)
-
-                    Format your response as a single, searchable paragraph optimized for semantic search.
-                    Focus on concrete, observable details and spoken content that would help someone find this segment."""
-
-            content = [
-                {
-                    "type": "text",
-                    "text": prompt_text,
-                }
-            ]
+            prompt_text = self._build_prompt_text(
+                chunk_index,
+                start_time,
+                end_time,
+                video_filename,
+                previous_descriptions,
+                current_transcription,
+                previous_transcription,
+            )
 
-            for i, frame_data in enumerate(keyframes):
-                base64_image = base64.b64encode(frame_data).decode("utf-8")
-                content.append(
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg",
-                            "data": base64_image,
-                        },
-                    }
-                )
+            cache_key = None
+            if self.description_cache is not None:
+                cache_key = self._description_cache_key(keyframes, prompt_text)
+                cached = self._cache_get(cache_key)
+                if cached:
+                    logger.info(f"Description cache hit for chunk {chunk_index}")
+                    return f"Segment {chunk_index} ({start_time:.1f}s-{end_time:.1f}s): {cached}"
+
+            content = self._build_message_content(prompt_text, keyframes)
+            # Back off on 429s (honoring Retry-After) so concurrent chunks
+            # don't turn rate limiting into failed descriptions
+            estimated_tokens = self._estimate_tokens(prompt_text, keyframes)
+            for attempt in range(5):
+                try:
+                    self._rate_limiter.acquire()
+                    self._token_limiter.acquire(estimated_tokens)
+                    response = self.client.messages.create(
+                        model=_MODEL,
+                        max_tokens=300,
+                        messages=[{"role": "user", "content": content}],
+                    )
+                    break
+                except Exception as e:
+                    if getattr(e, "status_code", None) == 429 and attempt < 4:
+                        time.sleep(backoff_delay(e, attempt))
+                        continue
+                    raise
+
+            description = response.content[0].text
+            logger.info(
+                f"Generated description for chunk {chunk_index}: {description[:100]}..."
+            )
+
+            if cache_key is not None:
+                self._cache_put(cache_key, description)
+
+            return f"Segment {chunk_index} ({start_time:.1f}s-{end_time:.1f}s): {description}"
 
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=300,
-                messages=[{"role": "user", "content": content}],
+        except Exception as e:
+            logger.error(
+                f"Failed to generate description for chunk {chunk_index}: {str(e)}"
             )
+            return f"Video segment {chunk_index} from {video_filename} ({start_time:.1f}s to {end_time:.1f}s)"
+
+    async def generate_description_async(
+        self,
+        video_chunk_data: bytes,
+        chunk_index: int,
+        start_time: float,
+        end_time: float,
+        video_filename: str = "video",
+        previous_descriptions: Optional[List[Tuple[int, float, float, str]]] = None,
+        current_transcription: Optional[str] = None,
+        previous_transcription: Optional[str] = None,
+        keyframes: Optional[List[bytes]] = None,
+    ) -> str:
+        """Async variant of generate_description for concurrent chunk pipelines
+
+        Awaiting the API call instead of blocking lets all chunk descriptions
+        overlap, so a video costs roughly one LLM round trip instead of one
+        per chunk. Keyframe extraction runs as an asyncio subprocess,
+        and is skipped entirely when the caller passes `keyframes` sampled
+        during the split pass.
+        """
+        try:
+            if keyframes is None:
+                keyframes = await self.extract_keyframes_async(video_chunk_data)
+
+            if not keyframes:
+                logger.warning(f"No keyframes extracted for chunk {chunk_index}")
+                return f"Video segment {chunk_index} from {start_time:.1f}s to {end_time:.1f}s"
+
+            prompt_text = self._build_prompt_text(
+                chunk_index,
+                start_time,
+                end_time,
+                video_filename,
+                previous_descriptions,
+                current_transcription,
+                previous_transcription,
+            )
+
+            cache_key = None
+            if self.description_cache is not None:
+                cache_key = self._description_cache_key(keyframes, prompt_text)
+                cached = await asyncio.to_thread(self._cache_get, cache_key)
+                if cached:
+                    logger.info(f"Description cache hit for chunk {chunk_index}")
+                    return f"Segment {chunk_index} ({start_time:.1f}s-{end_time:.1f}s): {cached}"
+
+            # The per-frame base64 runs in C and releases the GIL, so on a
+            # thread it overlaps other chunks' network I/O instead of
+            # stalling the event loop
+            content = await asyncio.to_thread(
+                self._build_message_content, prompt_text, keyframes
+            )
+            estimated_tokens = self._estimate_tokens(prompt_text, keyframes)
+            for attempt in range(5):
+                try:
+                    await self._rate_limiter.acquire_async()
+                    await self._token_limiter.acquire_async(estimated_tokens)
+                    response = await self.async_client.messages.create(
+                        model=_MODEL,
+                        max_tokens=300,
+                        messages=[{"role": "user", "content": content}],
+                    )
+                    break
+                except Exception as e:
+                    if getattr(e, "status_code", None) == 429 and attempt < 4:
+                        await asyncio.sleep(backoff_delay(e, attempt))
+                        continue
+                    raise
 
             description = response.content[0].text
             logger.info(
                 f"Generated description for chunk {chunk_index}: {description[:100]}..."
             )
 
+            if cache_key is not None:
+                await asyncio.to_thread(self._cache_put, cache_key, description)
+
             return f"Segment {chunk_index} ({start_time:.1f}s-{end_time:.1f}s): {description}"
 
         except Exception as e:
@@ -200,50 +501,71 @@ class VLMService:
             )
             return f"Video segment {chunk_index} from {video_filename} ({start_time:.1f}s to {end_time:.1f}s)"
 
-    def generate_batch_descriptions(
+    async def generate_batch_descriptions(
         self,
         chunks: List[Tuple[str, bytes, int, float, float]],
         video_filename: str = "video",
         transcriptions: Optional[List[Dict[str, Any]]] = None,
+        concurrency: int = 8,
     ) -> List[str]:
         """
         Generate descriptions for multiple video chunks with sliding window context
         Enhanced with transcription context
         Returns list of descriptions in same order as chunks
+
+        Chunks are processed in waves of `concurrency`: every chunk in a
+        wave sees the descriptions finalized before the wave started (its
+        sliding window filtered from that shared prefix) and its own
+        transcription context, so the wave's requests are independent and
+        run under asyncio.gather. One network round trip per wave instead
+        of one per chunk; within-wave neighbors trade away each other's
+        descriptions as context.
+
+        Keyframe extraction runs as a producer stage ahead of the waves: an
+        extractor task feeds per-chunk decode tasks through a bounded queue,
+        so ffmpeg for upcoming chunks overlaps the current wave's Claude
+        round trip instead of serializing with it. The queue's maxsize
+        bounds how many decoded frame sets can pile up in memory.
         """
-        descriptions = []
-        description_history = []  # List of (chunk_index, start_time, end_time, description_text)
-        previous_transcription = None
+        descriptions: List[str] = []
+        # (chunk_index, start_time, end_time, description_text) entries;
+        # maxlen bounds both memory and each chunk's context scan to the
+        # window size — only the newest sliding_window_chunks entries can
+        # ever be relevant, so O(N * window) total instead of O(N^2)
+        description_history = deque(maxlen=self.sliding_window_chunks)
+
+        # Producer stage: decode tasks enter the queue in chunk order; put()
+        # blocks once `concurrency` sets are in flight ahead of the waves.
+        # The ffmpeg semaphore still caps the actual subprocess count.
+        extract_q: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+        async def extract_all():
+            for chunk in chunks:
+                task = asyncio.create_task(
+                    self.extract_keyframes_async(chunk[1])
+                )
+                await extract_q.put(task)
 
-        for i, (chunk_id, chunk_data, chunk_index, start_time, end_time) in enumerate(chunks):
-            # Get current transcription if available
+        async def describe_one(i, chunk, frames_task):
+            chunk_id, chunk_data, chunk_index, start_time, end_time = chunk
+            keyframes = await frames_task
             current_transcription = None
             if transcriptions and i < len(transcriptions):
                 current_transcription = transcriptions[i].get("text", "")
-            # Calculate which previous descriptions to include based on sliding window
-            relevant_context = []
-
-            if description_history:
-                # Include descriptions within the sliding window time range
-                window_start_time = max(0, start_time - SLIDING_WINDOW_SECONDS)
-
-                for hist_idx, hist_start, hist_end, hist_desc in description_history:
-                    # Include if the historical chunk ends after our window start
-                    if hist_end > window_start_time and hist_idx < chunk_index:
-                        relevant_context.append(
-                            (hist_idx, hist_start, hist_end, hist_desc)
-                        )
-
-                # Limit to most recent chunks based on sliding_window_chunks
-                if len(relevant_context) > self.sliding_window_chunks:
-                    relevant_context = relevant_context[-self.sliding_window_chunks :]
-
-                logger.info(
-                    f"Processing chunk {chunk_index} with context from {len(relevant_context)} previous chunks"
-                )
+            previous_transcription = None
+            if transcriptions and 0 < i <= len(transcriptions):
+                previous_transcription = transcriptions[i - 1].get("text", "")
+
+            # Include descriptions within the sliding window time range,
+            # drawn from the history finalized before this wave
+            window_start_time = max(0, start_time - SLIDING_WINDOW_SECONDS)
+            relevant_context = [
+                entry
+                for entry in description_history
+                if entry[2] > window_start_time and entry[0] < chunk_index
+            ]
 
-            # Generate description with context and transcription
-            description = self.generate_description(
+            return await self.generate_description_async(
                 chunk_data,
                 chunk_index,
                 start_time,
@@ -252,23 +574,44 @@ class VLMService:
                 previous_descriptions=relevant_context if relevant_context else None,
                 current_transcription=current_transcription,
                 previous_transcription=previous_transcription,
+                keyframes=keyframes,
             )
 
-            # Extract just the description text (remove the prefix)
-            if ": " in description:
-                description_text = description.split(": ", 1)[1]
-            else:
-                description_text = description
-
-            # Add to history for future chunks
-            description_history.append(
-                (chunk_index, start_time, end_time, description_text)
-            )
-
-            # Keep full formatted description for return
-            descriptions.append(description)
+        extractor = asyncio.create_task(extract_all())
+        try:
+            for wave_start in range(0, len(chunks), concurrency):
+                wave = chunks[wave_start:wave_start + concurrency]
+                wave_frames = [await extract_q.get() for _ in wave]
+                # End times are monotonic, so entries outside even the wave's
+                # earliest window can be dropped up front in amortized O(1)
+                earliest_window = max(0, wave[0][3] - SLIDING_WINDOW_SECONDS)
+                while description_history and description_history[0][2] <= earliest_window:
+                    description_history.popleft()
+                logger.info(
+                    f"Describing chunks {wave_start}-{wave_start + len(wave) - 1} "
+                    f"with context from {len(description_history)} previous chunks"
+                )
+                wave_descriptions = await asyncio.gather(
+                    *[
+                        describe_one(wave_start + j, chunk, wave_frames[j])
+                        for j, chunk in enumerate(wave)
+                    ]
+                )
 
-            # Update previous transcription for next iteration
-            previous_transcription = current_transcription
+                for chunk, description in zip(wave, wave_descriptions):
+                    _, _, chunk_index, start_time, end_time = chunk
+                    # Extract just the description text (remove the prefix)
+                    _, sep, description_text = description.partition(": ")
+                    if not sep:
+                        description_text = description
+                    description_history.append(
+                        (chunk_index, start_time, end_time, description_text)
+                    )
+                    descriptions.append(description)
+        finally:
+            extractor.cancel()
+            # Reap any decode tasks still queued ahead of the failure point
+            while not extract_q.empty():
+                extract_q.get_nowait().cancel()
 
         return descriptions
@@ -1,9 +1,15 @@
+import os
+
 BUCKET_NAME = "hack-bucket25"
 CHUNK_DURATION_SECONDS = 15
 PRESIGNED_URL_EXPIRY_SECONDS = 3600
 SLIDING_WINDOW_SECONDS = 15  # Sliding window for context in VLM descriptions
 
 VIDEO_CHUNK_FORMAT = "mp4"
-TEMP_DIR = "/tmp"
+# Chunk/frame temp files are written once and read back immediately, so they
+# live on the tmpfs ramdisk when the container provides one — no block-device
+# I/O for intermediates
+TEMP_DIR = "/dev/shm/flashback" if os.path.isdir("/dev/shm") else "/tmp"
+os.makedirs(TEMP_DIR, exist_ok=True)
 
 GCS_ENDPOINT_URL = "https://storage.googleapis.com"
@@ -0,0 +1,56 @@
+import logging
+import subprocess
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+_hwaccel_args: Optional[List[str]] = None
+
+
+def detect_hwaccel_args() -> List[str]:
+    """Probe ffmpeg for usable CUDA decode support once per process
+
+    On GPU-capable containers NVDEC offloads the H.264/HEVC decode that
+    splitting and keyframe extraction imply, freeing the CPU for the encode
+    side; on CPU-only containers this returns no extra args. -hwaccels only
+    lists what the build was compiled with — distro ffmpeg reports cuda on
+    hosts with no GPU — so the probe also has ffmpeg create a CUDA device,
+    which fails cleanly when none exists. The probe runs once and is shared
+    by every service that spawns ffmpeg.
+    """
+    global _hwaccel_args
+    if _hwaccel_args is not None:
+        return _hwaccel_args
+
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-hwaccels"],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        if "cuda" in result.stdout.split():
+            # ffmpeg exits nonzero when -init_hw_device can't create the
+            # device; the throwaway lavfi frame just gives it a valid job
+            device = subprocess.run(
+                [
+                    "ffmpeg", "-hide_banner", "-v", "error",
+                    "-init_hw_device", "cuda",
+                    "-f", "lavfi", "-i", "nullsrc=s=2x2:d=0.05",
+                    "-frames:v", "1", "-f", "null", "-",
+                ],
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                timeout=10,
+            )
+            if device.returncode == 0:
+                logger.info("ffmpeg CUDA hwaccel available; using NVDEC for decode")
+                _hwaccel_args = ["-hwaccel", "cuda"]
+                return _hwaccel_args
+            logger.info("ffmpeg built with CUDA but no usable device; staying on software decode")
+    except Exception as e:
+        logger.warning(f"Could not probe ffmpeg hwaccels: {str(e)}")
+
+    _hwaccel_args = []
+    return _hwaccel_args
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Token-bucket rate limiter with sync and async acquire
+
+    Tokens refill continuously at rate per period seconds; callers block (or
+    await) until one is available. Putting this in front of a provider's API
+    keeps throughput pinned just under its RPM ceiling instead of bursting
+    into 429s and oscillating through backoff.
+    """
+
+    def __init__(self, rate: float, period: float = 60.0):
+        self.rate = float(rate)
+        self.period = float(period)
+        self._tokens = self.rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens; return how long to wait before they are valid"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate,
+                self._tokens + (now - self._updated) * (self.rate / self.period),
+            )
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * (self.period / self.rate)
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def backoff_delay(exc: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying a rate-limited API call
+
+    Honors the provider's Retry-After header when the SDK exposes the
+    response; falls back to exponential backoff otherwise.
+    """
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is not None:
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return float(2 ** attempt)